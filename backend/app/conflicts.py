@@ -0,0 +1,193 @@
+import os
+import threading
+import time as _time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Appointment
+
+# Seconds a cached day is trusted before it is reloaded from the database.
+# Keeps workers that don't see each other's writes from drifting for long.
+CONFLICT_INDEX_TTL = float(os.getenv("CONFLICT_INDEX_TTL", "60"))
+# Most (owner, day) entries kept per worker; the least recently checked go first
+CONFLICT_INDEX_SIZE = int(os.getenv("CONFLICT_INDEX_SIZE", "4096"))
+
+
+def to_minutes(value) -> int:
+    """Minutes since midnight for a time/datetime object"""
+    return value.hour * 60 + value.minute
+
+
+def day_bounds(day: date_type) -> Tuple[datetime, datetime]:
+    """Half-open [day, day+1) datetime range for index-friendly date filters"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def day_appointments_query(db: Session, owner_id: int, day: date_type):
+    """(id, start_time, duration) of one owner's appointments on one day"""
+    day_start, day_end = day_bounds(day)
+    return db.query(
+        Appointment.id, Appointment.start_time, Appointment.duration
+    ).filter(
+        Appointment.business_id == owner_id,
+        Appointment.date >= day_start,
+        Appointment.date < day_end
+    )
+
+
+class DayIntervals:
+    """
+    Sorted [start, end) minute intervals of one business on one day.
+
+    Intervals are kept ordered by start together with a running maximum of
+    the end times, so an overlap query is a binary search followed by a walk
+    over the (usually zero or one) intervals that actually overlap.
+    """
+
+    def __init__(self):
+        self.entries = []   # (start, end, appointment_id), sorted
+        self.max_end = []   # max_end[i] == max(end for entries[:i + 1])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _rebuild_from(self, index: int):
+        running = self.max_end[index - 1] if index > 0 else -1
+        del self.max_end[index:]
+        for _, end, _ in self.entries[index:]:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def add(self, start: int, end: int, appointment_id: int):
+        entry = (start, end, appointment_id)
+        insort(self.entries, entry)
+        self._rebuild_from(bisect_left(self.entries, entry))
+
+    def remove(self, appointment_id: int) -> bool:
+        for i, entry in enumerate(self.entries):
+            if entry[2] == appointment_id:
+                del self.entries[i]
+                self._rebuild_from(i)
+                return True
+        return False
+
+    def find_overlap(self, start: int, end: int, exclude_id: Optional[int] = None) -> Optional[int]:
+        """Return the id of an appointment overlapping [start, end), or None"""
+        i = bisect_left(self.entries, (end,)) - 1
+        while i >= 0 and self.max_end[i] > start:
+            entry_start, entry_end, appointment_id = self.entries[i]
+            if entry_end > start and appointment_id != exclude_id:
+                return appointment_id
+            i -= 1
+        return None
+
+
+class ConflictIndex:
+    """
+    Process-wide cache of DayIntervals keyed by (owner_id, day).
+
+    A day is loaded from the database the first time it is checked and kept
+    up to date by the booking routes through add()/discard(). At most `size`
+    days are kept, least recently checked evicted first.
+    """
+
+    def __init__(self, ttl: float = CONFLICT_INDEX_TTL, size: int = CONFLICT_INDEX_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._days: "OrderedDict[Tuple[int, date_type], Tuple[float, DayIntervals]]" = OrderedDict()
+        self._keys_by_id: Dict[int, Tuple[int, date_type]] = {}
+        self._generation = 0  # bumped on every change made outside a load
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._days)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._days.clear()
+            self._keys_by_id.clear()
+
+    def invalidate(self, owner_id: int, day: date_type):
+        with self._lock:
+            self._generation += 1
+            self._drop((owner_id, day))
+
+    def _drop(self, key):
+        cached = self._days.pop(key, None)
+        if cached:
+            for _, _, appointment_id in cached[1].entries:
+                self._keys_by_id.pop(appointment_id, None)
+
+    def _load(self, db: Session, owner_id: int, day: date_type) -> DayIntervals:
+        rows = day_appointments_query(db, owner_id, day).all()
+        intervals = DayIntervals()
+        for appointment_id, start_time, duration in rows:
+            start = to_minutes(start_time)
+            intervals.add(start, start + duration, appointment_id)
+        return intervals
+
+    def get(self, db: Session, owner_id: int, day: date_type) -> DayIntervals:
+        key = (owner_id, day)
+        now = _time.monotonic()
+        with self._lock:
+            cached = self._days.get(key)
+            if cached and now - cached[0] < self.ttl:
+                self._days.move_to_end(key)
+                return cached[1]
+            generation = self._generation
+
+        intervals = self._load(db, owner_id, day)
+        with self._lock:
+            self._drop(key)
+            # a booking committed or removed while we were reading may be
+            # missing from these rows, so only cache a load nothing raced
+            if generation != self._generation or self.size <= 0:
+                return intervals
+            self._days[key] = (now, intervals)
+            for _, _, appointment_id in intervals.entries:
+                self._keys_by_id[appointment_id] = key
+            while len(self._days) > self.size:
+                self._drop(next(iter(self._days)))
+        return intervals
+
+    def find_overlap(
+        self,
+        db: Session,
+        owner_id: int,
+        day: date_type,
+        start: int,
+        end: int,
+        exclude_id: Optional[int] = None
+    ) -> Optional[int]:
+        intervals = self.get(db, owner_id, day)
+        with self._lock:
+            return intervals.find_overlap(start, end, exclude_id)
+
+    def add(self, owner_id: int, day: date_type, start: int, end: int, appointment_id: int):
+        """Record a committed appointment in an already cached day"""
+        key = (owner_id, day)
+        with self._lock:
+            self._generation += 1
+            cached = self._days.get(key)
+            if not cached:
+                return
+            cached[1].add(start, end, appointment_id)
+            self._keys_by_id[appointment_id] = key
+
+    def discard(self, appointment_id: int):
+        """Forget a deleted or moved appointment"""
+        with self._lock:
+            self._generation += 1
+            key = self._keys_by_id.pop(appointment_id, None)
+            cached = self._days.get(key) if key else None
+            if cached:
+                cached[1].remove(appointment_id)
+
+
+conflict_index = ConflictIndex()
@@ -1,13 +1,21 @@
 # app/database.py
 from dotenv import load_dotenv
 import os
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from app.pool_monitor import PoolMonitor
+import logging
 import time
 
 # Load .env if it's not already loaded
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 def wait_for_db():
     max_retries = 30
     retry_interval = 1
@@ -17,42 +25,138 @@ def wait_for_db():
             # Test connection
             engine = create_engine(DATABASE_URL, pool_pre_ping=True)
             with engine.connect() as connection:
-                print("Database connection successful!")
+                logger.info("Database connection successful")
             return True
         except Exception as e:
-            print(f"Attempt {i + 1}/{max_retries} failed: {e}")
+            logger.warning("Attempt %d/%d failed: %s", i + 1, max_retries, e)
             if i < max_retries - 1:
-                print(f"Retrying in {retry_interval} seconds...")
+                logger.info("Retrying in %d seconds", retry_interval)
                 time.sleep(retry_interval)
     return False
 
+# Connection pool settings, per engine (each worker process has its own engines)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+# Optional read replica; GET requests read from it unless the route asks for the primary
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+
+# Requests that may be served from the replica
+READ_METHODS = {"GET", "HEAD"}
+
+# Pool stats by engine name, served by /internal/pool
+pool_monitors = {}
+
+def monitored_engines(name: str, url: str, async_url: str):
+    """Sync and async MySQL engines for one server, with monitored pools"""
+    settings = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+    monitor = pool_monitors[name] = PoolMonitor(name)
+    sync_engine = monitor.watch(create_engine(url, poolclass=monitor.pool_class(QueuePool), **settings))
+    async_monitor = pool_monitors[f"async_{name}"] = PoolMonitor(f"async_{name}")
+    async_db_engine = create_async_engine(
+        async_url, poolclass=async_monitor.pool_class(AsyncAdaptedQueuePool), **settings
+    )
+    async_monitor.watch(async_db_engine.sync_engine)
+    return sync_engine, async_db_engine
+
+replica_engine = None
+async_replica_engine = None
+
 # Database connection settings
 if os.environ.get('TESTING') == 'True':
     DATABASE_URL = "sqlite:///./test.db"
-    engine = create_engine(
+    pool_monitors["primary"] = PoolMonitor("primary")
+    engine = pool_monitors["primary"].watch(create_engine(
         DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
+        connect_args={"check_same_thread": False},
+        poolclass=pool_monitors["primary"].pool_class(QueuePool)
+    ))
+    ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+    # TestClient runs every request on a fresh event loop, so don't pool
+    # aiosqlite connections across loops
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
 else:
     DB_HOST = os.getenv("DB_HOST", "db")
     DB_NAME = os.getenv("DB_NAME", "appointmentdb")
     DB_USER = os.getenv("DB_USER", "appointment_user")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "appointment_password")
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-    engine = create_engine(
-        DATABASE_URL,
-        pool_size=5,
-        max_overflow=10,
-        pool_pre_ping=True,
-        pool_recycle=3600
+    ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+    engine, async_engine = monitored_engines("primary", DATABASE_URL, ASYNC_DATABASE_URL)
+    if DB_REPLICA_HOST:
+        replica_engine, async_replica_engine = monitored_engines(
+            "replica",
+            f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}/{DB_NAME}",
+            f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}/{DB_NAME}"
+        )
+
+def replica_session_class(primary, replica):
+    """
+    Session class that reads through `replica` but flushes, and runs any
+    INSERT/UPDATE/DELETE statement, on `primary`
+    """
+    class ReplicaSession(Session):
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self._flushing or isinstance(clause, UpdateBase):
+                return primary
+            return replica
+    return ReplicaSession
+
+def replica_sessionmaker(primary, replica) -> sessionmaker:
+    return sessionmaker(
+        class_=replica_session_class(primary, replica),
+        autocommit=False,
+        autoflush=False,
+        info={"replica": True}
+    )
+
+def async_replica_sessionmaker(primary, replica) -> async_sessionmaker:
+    return async_sessionmaker(
+        sync_session_class=replica_session_class(primary.sync_engine, replica.sync_engine),
+        autoflush=False,
+        expire_on_commit=False,
+        info={"replica": True}
     )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = replica_sessionmaker(engine, replica_engine) if replica_engine else None
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+def use_primary(request: Request):
+    """
+    Route dependency that keeps a read request on the primary, for pages that
+    must see the caller's own writes straight away:
+    @router.get(..., dependencies=[Depends(use_primary)])
+    """
+    request.state.use_primary = True
+
+def reads_from_replica(request: Request) -> bool:
+    return request.method in READ_METHODS and not getattr(request.state, "use_primary", False)
+
+def get_db(request: Request):
+    use_replica = ReplicaSessionLocal is not None and reads_from_replica(request)
+    db = ReplicaSessionLocal() if use_replica else SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async sessions for `async def` routes, so their queries don't block the event loop.
+# Objects stay usable after commit since they can't lazy-load outside an await.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReplicaSessionLocal = (
+    async_replica_sessionmaker(async_engine, async_replica_engine) if async_replica_engine else None
+)
+
+async def get_async_db(request: Request):
+    use_replica = AsyncReplicaSessionLocal is not None and reads_from_replica(request)
+    async with (AsyncReplicaSessionLocal() if use_replica else AsyncSessionLocal()) as db:
+        yield db
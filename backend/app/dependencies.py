@@ -1,37 +1,72 @@
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
 from app.security import SECRET_KEY, ALGORITHM
-from app.database import SessionLocal
+from app.database import get_db, get_async_db, use_primary
 import jwt
 from jwt.exceptions import InvalidTokenError
 from app.models import User
+from app.user_cache import user_cache
+from app.token_cache import token_cache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jwt import PyJWTError
+import hmac
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Shared secret for the /internal endpoints; unset keeps them switched off
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "")
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            token_cache.put(token, payload)
         user_data = payload.get("sub")
         role = payload.get("role")
-        if not user_data or not role:
+        # scoped tokens (event stream tickets) are only good for their own endpoint
+        if not user_data or not role or "scope" in payload:
             raise HTTPException(status_code=401, detail="Invalid authentication token")
-        print(f"Decoded JWT: {payload}") 
+        logger.debug("Authenticated %s (%s)", user_data, role)
         return payload  
     except PyJWTError as e:
-        print(f"JWT Error: {str(e)}")  
+        logger.info("Rejected token: %s", e)
         raise HTTPException(status_code=401, detail="Invalid authentication token")
-    
-    
+
+
+def _checked_user(user, current_user: dict) -> User:
+    # the id is only trusted together with the username it was issued for
+    if not user or user.username != current_user["sub"]:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def current_user_db(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    """The authenticated User, looked up once per request through user_cache"""
+    if "uid" in current_user:
+        user = user_cache.get(db, current_user["uid"])
+    else:  # token issued before it carried the id
+        user = db.query(User).filter(User.username == current_user["sub"]).first()
+    return _checked_user(user, current_user)
+
+async def async_current_user_db(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """current_user_db for routes on an AsyncSession"""
+    if "uid" in current_user:
+        user = await user_cache.get_async(db, current_user["uid"])
+    else:
+        user = await db.scalar(select(User).where(User.username == current_user["sub"]))
+    return _checked_user(user, current_user)
+
+
 def check_user_role(required_role: str):
     def role_checker(current_user: dict = Depends(get_current_user)):
         user_role = current_user.get("role")
@@ -40,6 +75,16 @@ def check_user_role(required_role: str):
         return current_user
     return role_checker
 
+def internal_token_required(x_internal_token: str = Header(""), authorization: str = Header("")):
+    """Guard for operational endpoints: the X-Internal-Token header, or an
+    Authorization bearer token (as Prometheus scrapers send), must match INTERNAL_TOKEN"""
+    if not INTERNAL_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, credentials = authorization.partition(" ")
+    token = x_internal_token or (credentials.strip() if scheme.lower() == "bearer" else "")
+    if not hmac.compare_digest(token.encode(), INTERNAL_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid internal token")
+
 def business_owner_required(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "business_owner":
         raise HTTPException(status_code=403, detail="Access forbidden: Only business owners are allowed.")
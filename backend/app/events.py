@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# "local" delivers within this process only; "redis" fans out across workers
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Events buffered per connection before a slow client starts missing them
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+Deliver = Callable[[str, str], None]
+
+
+class LocalBackend:
+    """Single-worker backend: a published event goes straight to this process's hub"""
+
+    def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    def publish(self, channel: str, payload: str):
+        self._deliver(channel, payload)
+
+    def stop(self):
+        pass
+
+
+class RedisBackend:
+    """
+    Multi-worker backend over Redis pub/sub (needs the optional `redis`
+    package). Every worker subscribes to all event channels on a daemon
+    thread; publishing is handed to a single background thread so request
+    handlers never wait on Redis.
+    """
+
+    PREFIX = "events:"
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="events-publish")
+        self._pubsub = None
+
+    def start(self, deliver: Deliver):
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(f"{self.PREFIX}*")
+
+        def listen():
+            for message in self._pubsub.listen():
+                channel = message["channel"].decode()[len(self.PREFIX):]
+                deliver(channel, message["data"].decode())
+
+        threading.Thread(target=listen, name="events-listen", daemon=True).start()
+
+    def publish(self, channel: str, payload: str):
+        future = self._publisher.submit(self._client.publish, self.PREFIX + channel, payload)
+        future.add_done_callback(lambda done: done.exception() and logger.error(
+            "Publishing to %s failed", channel, exc_info=done.exception()
+        ))
+
+    def stop(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+        self._publisher.shutdown(wait=False)
+
+
+class Subscription:
+    """One connected client: a bounded queue fed from any thread"""
+
+    def __init__(self, owner_id: int, maxsize: int):
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def _put(self, payload: str):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def put(self, payload: str):
+        try:
+            self.loop.call_soon_threadsafe(self._put, payload)
+        except RuntimeError:
+            pass  # its loop has shut down; the client is gone
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+
+class EventHub:
+    """
+    In-process pub/sub of per-business events. Routes publish from any thread
+    once their transaction has committed; each connected client of that
+    business gets its own copy. Events travel through the backend, so with
+    more than one worker a client sees events published by all of them.
+    """
+
+    def __init__(self, backend=None, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self.backend is None:
+                self.backend = RedisBackend() if EVENTS_BACKEND == "redis" else LocalBackend()
+            self.backend.start(self._deliver)
+            self._started = True
+
+    def stop(self):
+        with self._lock:
+            if self._started:
+                self.backend.stop()
+                self._started = False
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        """Register a client; call from the event loop that will read it"""
+        self.start()
+        subscription = Subscription(owner_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(owner_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.owner_id, None)
+        if subscription.dropped:
+            logger.warning("Client of business %d missed %d events", subscription.owner_id, subscription.dropped)
+
+    def publish(self, owner_id: int, event: str, data: dict):
+        """Send an event to every connected client of one business, as a ready-made SSE frame"""
+        self.start()
+        payload = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        try:
+            self.backend.publish(str(owner_id), payload)
+        except Exception:
+            # a lost notification must never fail the request that committed
+            logger.exception("Could not publish %s event for business %d", event, owner_id)
+
+    def _deliver(self, channel: str, payload: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(int(channel), ()))
+        for subscription in subscribers:
+            subscription.put(payload)
+
+    def connected(self, owner_id: Optional[int] = None) -> int:
+        with self._lock:
+            if owner_id is None:
+                return sum(len(subscribers) for subscribers in self._subscribers.values())
+            return len(self._subscribers.get(owner_id, ()))
+
+
+event_hub = EventHub()
@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.auth import router as auth_router  
 from app.routes.shared import router as shared_router  
@@ -6,12 +8,33 @@ from app.routes.business_extras import router as business_router
 from app.routes.services import router as services_router
 from app.routes.availability import router as availability_router
 from app.routes.messages import router as messages_router
+from app.routes.internal import router as internal_router
+from app.routes.events import router as events_router
+from app.database import async_engine, async_replica_engine
+from app.events import event_hub
+from app.query_stats import QueryStatsMiddleware
+from app.metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE
+from app.logging_config import setup_logging
+from app.dependencies import internal_token_required
 
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_hub.start()
+    yield
+    event_hub.stop()
+    # close pooled async connections on the loop that opened them
+    for engine in (async_engine, async_replica_engine):
+        if engine is not None:
+            await engine.dispose()
 
 app = FastAPI(
     title="Appointment Management API",
     version="1.0.0",
-    description="API for managing appointments"
+    description="API for managing appointments",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -21,17 +44,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 async def root():
     return {"message": "API is running"}
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(internal_token_required)])
+def metrics():
+    """Prometheus text exposition of request, DB and pool metrics"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(shared_router, prefix="/api/shared", tags=["Shared"])
 app.include_router(business_router, prefix="/api/business", tags=["Business"])
 app.include_router(services_router, prefix="/api/services", tags=["Services"])
 app.include_router(availability_router, prefix="/api/availability", tags=["Availability"])
 app.include_router(messages_router, prefix="/api/messages", tags=["Messages"])
+app.include_router(events_router, prefix="/api/events", tags=["Events"])
+app.include_router(internal_router, prefix="/internal", tags=["Internal"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,46 @@
+import re
+from typing import List, Tuple
+
+from sqlalchemy import Float, func, literal_column, select, table, column, type_coerce
+from sqlalchemy.dialects import mysql
+
+from app.models import Message
+from app.pagination import Keyset
+
+# Words of a search beyond this are ignored
+MAX_SEARCH_TERMS = 10
+
+_fts = table("messages_fts", column("rowid"))
+
+
+def search_terms(q: str) -> List[str]:
+    """
+    Plain words of a search box query. Operators and quotes are dropped, so
+    user input can never be a syntax error in either full-text dialect.
+    """
+    return re.findall(r"\w+", q.lower())[:MAX_SEARCH_TERMS]
+
+
+def inbox_search(dialect: str, recipient_id: int, terms: List[str]) -> Tuple:
+    """
+    select(Message, relevance, Message.id) of one recipient's messages whose
+    content has every term (as a word prefix), with the Keyset that orders
+    them most relevant first. The match runs on the inverted index - MySQL
+    FULLTEXT, or the messages_fts table on SQLite - so only matching rows
+    are read, however large the inbox.
+    """
+    if dialect == "mysql":
+        match = mysql.match(Message.content, against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+        relevance = type_coerce(match, Float).label("relevance")
+        query = select(Message, relevance, Message.id).where(match, Message.recipient_id == recipient_id)
+    else:
+        # bm25() is lower for better matches
+        relevance = type_coerce(-func.bm25(literal_column("messages_fts")), Float).label("relevance")
+        query = select(Message, relevance, Message.id).join(_fts, _fts.c.rowid == Message.id).where(
+            literal_column("messages_fts").op("MATCH")(" ".join(f'"{term}"*' for term in terms)),
+            # "+ 0" keeps SQLite off the recipient index, which would re-run the
+            # match once per message in the inbox instead of once overall
+            Message.recipient_id + 0 == recipient_id
+        )
+    # Message.id is selected again so each result row carries its own cursor values
+    return query, Keyset(relevance, Message.id, descending=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Time, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Time, ForeignKey, Enum, Boolean, Index, DDL, event
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime, time
@@ -6,6 +6,10 @@ import pytz
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # with the primary key appended: the public business catalog in id order
+        Index("ix_users_role", "role"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(100), nullable=False)
@@ -20,8 +24,14 @@ class User(Base):
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_business_date_start", "business_id", "date", "start_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, nullable=False)
+    business_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    service_id = Column(Integer, ForeignKey("services.id", ondelete="SET NULL"), nullable=True, index=True)
+    series_id = Column(Integer, ForeignKey("appointment_series.id"), nullable=True, index=True)
+    date = Column(DateTime, nullable=False, index=True)
     start_time = Column(Time, nullable=False)
     duration = Column(Integer, nullable=False)
     title = Column(String(200), nullable=False)
@@ -30,6 +40,31 @@ class Appointment(Base):
     type = Column(String(100), nullable=False)
     cost = Column(Integer, nullable=False)
     notes = Column(String(500), nullable=True)
+    series = relationship("AppointmentSeries", back_populates="appointments")
+
+class AppointmentSeries(Base):
+    """A recurring booking: the same slot every interval_days days"""
+    __tablename__ = "appointment_series"
+    id = Column(Integer, primary_key=True, index=True)
+    business_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    service_id = Column(Integer, ForeignKey("services.id", ondelete="SET NULL"), nullable=True)
+    first_date = Column(DateTime, nullable=False)
+    start_time = Column(Time, nullable=False)
+    interval_days = Column(Integer, nullable=False)
+    customer_name = Column(String(200), nullable=False)
+    customer_phone = Column(String(20), nullable=False)
+    appointments = relationship("Appointment", back_populates="series")
+
+class BookingDay(Base):
+    """
+    Booking lock of one business's day. Writers upsert the row first, which
+    holds it until commit, so bookings for the same day take turns while
+    other days and businesses proceed in parallel.
+    """
+    __tablename__ = "booking_days"
+    business_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped by every booking write
 
 class Service(Base):
     __tablename__ = "services"
@@ -52,6 +87,9 @@ class Topic(Base):
 
 class Availability(Base):
     __tablename__ = "availability"
+    __table_args__ = (
+        Index("ix_availability_owner_day_start", "owner_id", "day_of_week", "start_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     day_of_week = Column(String(20), nullable=False)
     start_time = Column(Time, nullable=False)
@@ -68,6 +106,12 @@ def get_israel_time():
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # inbox pages: one recipient, newest first (the primary key breaks ties)
+        Index("ix_messages_recipient_created", "recipient_id", "created_at"),
+        # inverted index for inbox search; SQLite gets the messages_fts table below instead
+        Index("ix_messages_content_fulltext", "content", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -86,3 +130,26 @@ class Message(Base):
     
     sender = relationship("User", foreign_keys=[sender_id], backref="sent_messages")
     recipient = relationship("User", foreign_keys=[recipient_id], backref="received_messages")
+
+# SQLite stand-in for the FULLTEXT index: an FTS5 table over messages.content,
+# kept in step by triggers so bulk statements are covered too
+MESSAGES_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+)
+for statement in MESSAGES_FTS_DDL:
+    event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Message.__table__, "after_drop", DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite"))
+
+
+class UnreadCounter(Base):
+    """Unread messages per recipient, kept in step with messages by the message routes"""
+    __tablename__ = "unread_counters"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,121 @@
+import base64
+import json
+import os
+from datetime import date, datetime, time
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Request, Response
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+# Rows a request without limit/cursor still gets as a bare array
+BARE_LIST_LIMIT = int(os.getenv("BARE_LIST_LIMIT", "1000"))
+
+_PARSERS = {
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+    time: time.fromisoformat,
+    int: int,
+    float: float,
+    str: str,
+}
+
+
+class PageParams:
+    """
+    `limit` and `cursor` query parameters of a paginated list. Without either
+    parameter the endpoint answers with a bare array, as it did before
+    pagination, but that form is deprecated: it is capped at BARE_LIST_LIMIT
+    rows, carries a `Deprecation` header, and a truncated array carries a
+    `Link: <...>; rel="next"` header pointing at the rest as a page.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+    ):
+        self.requested = limit is not None or cursor is not None
+        self.limit = (limit or DEFAULT_PAGE_SIZE) if self.requested else BARE_LIST_LIMIT
+        self.cursor = cursor
+        self.request = request
+        self.response = response
+
+    def wrap(self, items: list, next_cursor: Optional[str]):
+        """A Page-shaped dict when paginating, else the bare list"""
+        if self.requested:
+            return {"items": items, "next_cursor": next_cursor}
+        self.response.headers["Deprecation"] = "true"
+        if next_cursor is not None:
+            url = self.request.url.include_query_params(limit=MAX_PAGE_SIZE, cursor=next_cursor)
+            self.response.headers["Link"] = f'<{url}>; rel="next"'
+        return items
+
+
+class RequiredPageParams(PageParams):
+    """PageParams for endpoints that always answer with a page, DEFAULT_PAGE_SIZE by default"""
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+    ):
+        super().__init__(request, response, limit, cursor)
+
+
+class Keyset:
+    """
+    Sort order of a paginated list. The columns must end in a unique one (the
+    primary key) and sort in one direction; a cursor holds the last row's
+    values, and the next page starts strictly after them. Back each Keyset
+    with an index on (filter columns..., sort columns...).
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def encode(self, row) -> str:
+        values = [getattr(row, column.key) for column in self.columns]
+        payload = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if len(values) != len(self.columns):
+                raise ValueError(cursor)
+            return tuple(
+                _PARSERS[column.type.python_type](value)
+                for column, value in zip(self.columns, values)
+            )
+        except (ValueError, TypeError, KeyError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def _after(self, values: Sequence):
+        # (a, b) < (x, y) spelled out as a < x OR (a = x AND b < y), which
+        # every backend can turn into a range scan on the index
+        clauses = []
+        for i, column in enumerate(self.columns):
+            beyond = column < values[i] if self.descending else column > values[i]
+            clauses.append(and_(*(c == v for c, v in zip(self.columns[:i], values[:i])), beyond))
+        return or_(*clauses)
+
+    def apply(self, query, page: PageParams):
+        """Order a select()/Query by this keyset and restrict it to the requested page"""
+        query = query.order_by(*(c.desc() if self.descending else c.asc() for c in self.columns))
+        if page.cursor:
+            query = query.where(self._after(self.decode(page.cursor)))
+        return query.limit(page.limit + 1)  # one extra row tells us whether a next page exists
+
+    def split(self, rows: List, page: PageParams) -> Tuple[List, Optional[str]]:
+        """The rows of this page and the cursor of the next one, if any"""
+        if len(rows) <= page.limit:
+            return rows, None
+        rows = rows[:page.limit]
+        return rows, self.encode(rows[-1])
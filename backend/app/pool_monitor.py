@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Connection waits longer than this are logged as warnings
+DB_POOL_SLOW_WAIT_MS = float(os.getenv("DB_POOL_SLOW_WAIT_MS", "100"))
+
+
+class PoolMonitor:
+    """
+    Counters for one engine's connection pool.
+
+    Checkouts, checkins and new connections come from SQLAlchemy pool events.
+    Pools have no event before a checkout, so the time spent waiting for a
+    connection is measured by the pool class returned from pool_class().
+    """
+
+    def __init__(self, name: str, slow_wait_ms: float = DB_POOL_SLOW_WAIT_MS):
+        self.name = name
+        self.slow_wait_ms = slow_wait_ms
+        self.engine = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidated = 0
+            self.waits = 0
+            self.slow_waits = 0
+            self.timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def pool_class(self, base):
+        """Subclass of `base` (e.g. QueuePool) that reports checkout waits here"""
+        monitor = self
+
+        class MonitoredPool(base):
+            def _do_get(self):
+                began = time.perf_counter()
+                try:
+                    connection = super()._do_get()
+                except PoolTimeoutError:
+                    monitor._record_wait(self, began, timed_out=True)
+                    raise
+                monitor._record_wait(self, began)
+                return connection
+
+        MonitoredPool.__name__ = f"Monitored{base.__name__}"
+        return MonitoredPool
+
+    def watch(self, engine):
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        return engine
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidated += 1
+
+    def _record_wait(self, pool, began: float, timed_out: bool = False):
+        waited_ms = (time.perf_counter() - began) * 1000
+        slow = waited_ms >= self.slow_wait_ms
+        with self._lock:
+            self.waits += 1
+            self.total_wait_ms += waited_ms
+            self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+            self.timeouts += timed_out
+            self.slow_waits += slow
+        if timed_out:
+            logger.error(
+                "%s pool timed out after %.0f ms (%s)", self.name, waited_ms, pool.status()
+            )
+        elif slow:
+            logger.warning(
+                "%s pool wait of %.0f ms (%s)", self.name, waited_ms, pool.status()
+            )
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidated": self.invalidated,
+                "slow_waits": self.slow_waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.waits, 3) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3)
+            }
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Add X-DB-Statements / X-DB-Time-Ms headers to every response
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "False") == "True"
+
+STATEMENTS_HEADER = "x-db-statements"
+DB_TIME_HEADER = "x-db-time-ms"
+
+
+class RequestQueries:
+    """SQL statements executed on behalf of one request"""
+
+    __slots__ = ("statements", "db_time")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+
+
+# Set by QueryStatsMiddleware; threadpool workers and aiosqlite/aiomysql
+# greenlets run in a copy of the request's context, so they see the same object
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+# The start time lives on the statement's execution context, so a statement
+# that raises (a slot claim losing its race, say) leaves nothing behind
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _finished(context):
+    queries = _current.get()
+    started = getattr(context, "_query_started", None)
+    if queries is not None and started is not None:
+        queries.statements += 1
+        queries.db_time += time.perf_counter() - started
+        context._query_started = None
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finished(context)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # a failed statement still went to the database and took its time
+    _finished(exception_context.execution_context)
+
+
+class RouteQueryTotals:
+    """Statement counts and DB time per route template, across requests"""
+
+    def __init__(self):
+        self._totals: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, queries: RequestQueries):
+        with self._lock:
+            totals = self._totals.get(route)
+            if totals is None:
+                totals = self._totals[route] = [0, 0, 0, 0.0]  # requests, statements, max, db time
+            totals[0] += 1
+            totals[1] += queries.statements
+            totals[2] = max(totals[2], queries.statements)
+            totals[3] += queries.db_time
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                route: {
+                    "requests": requests,
+                    "statements": statements,
+                    "avg_statements": round(statements / requests, 2),
+                    "max_statements": max_statements,
+                    "db_time_ms": round(db_time * 1000, 3)
+                }
+                for route, (requests, statements, max_statements, db_time) in self._totals.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+route_query_totals = RouteQueryTotals()
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route, e.g. /api/shared/appointments/{appointment_id}"""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "<unmatched>"
+    # a route inside an included router may only know its path relative to the
+    # router's prefix; the template has as many segments as the end of the path
+    prefix = scope["path"].rsplit("/", template.count("/"))[0]
+    return template if template.startswith(prefix) else prefix + template
+
+
+class QueryStatsMiddleware:
+    """
+    Count SQL statements and DB time for each HTTP request, record them per
+    route template and, when QUERY_STATS_HEADERS is on, return them as headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and QUERY_STATS_HEADERS:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (STATEMENTS_HEADER.encode(), str(queries.statements).encode()),
+                    (DB_TIME_HEADER.encode(), f"{queries.db_time * 1000:.3f}".encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            route_query_totals.record(route_template(scope), queries)
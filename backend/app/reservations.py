@@ -0,0 +1,69 @@
+from datetime import date as date_type
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from app.conflicts import DayIntervals, day_bounds, to_minutes
+from app.models import Appointment, BookingDay
+from app.slots import RANGES_PER_QUERY, day_runs
+
+# A booking to place: (day, start minute, duration)
+Booking = Tuple[date_type, int, int]
+
+
+def booking_day_upsert(dialect: str, business_id: int, day: date_type):
+    """
+    Statement creating or bumping a day's BookingDay row. Either way the
+    row ends up write-locked until the transaction ends (on SQLite, the
+    whole database is).
+    """
+    dialect_insert = mysql.insert if dialect == "mysql" else sqlite.insert
+    statement = dialect_insert(BookingDay).values(business_id=business_id, day=day, version=1)
+    if dialect == "mysql":
+        return statement.on_duplicate_key_update(version=BookingDay.version + 1)
+    return statement.on_conflict_do_update(
+        index_elements=[BookingDay.business_id, BookingDay.day],
+        set_={"version": BookingDay.version + 1}
+    )
+
+
+def lock_days(db: Session, business_id: int, days: Iterable[date_type]):
+    """Take the booking lock of each day, in date order so writers never deadlock"""
+    dialect = db.get_bind().dialect.name
+    for day in sorted(set(days)):
+        db.execute(booking_day_upsert(dialect, business_id, day))
+
+
+def committed_conflict(
+    db: Session,
+    business_id: int,
+    bookings: List[Booking],
+    exclude_id: Optional[int] = None
+) -> bool:
+    """
+    True if any booking overlaps an appointment in the database. Call it
+    after lock_days: the read is a locking one, so it sees everything
+    committed before the lock rather than the transaction's earlier snapshot.
+    """
+    runs = day_runs(sorted({day for day, _, _ in bookings}))
+    days = {}
+    for i in range(0, len(runs), RANGES_PER_QUERY):
+        rows = db.query(
+            Appointment.id, Appointment.date, Appointment.start_time, Appointment.duration
+        ).filter(
+            Appointment.business_id == business_id,
+            or_(*(
+                and_(Appointment.date >= day_bounds(first)[0], Appointment.date < day_bounds(last)[1])
+                for first, last in runs[i:i + RANGES_PER_QUERY]
+            ))
+        ).with_for_update()
+        for appointment_id, apt_date, start_time, duration in rows:
+            start = to_minutes(start_time)
+            days.setdefault(apt_date.date(), DayIntervals()).add(start, start + duration, appointment_id)
+
+    return any(
+        day in days and days[day].find_overlap(start, start + duration, exclude_id) is not None
+        for day, start, duration in bookings
+    )
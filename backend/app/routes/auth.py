@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas import UserCreate, UserLogin
 from app.models import User
-from app.security import get_password_hash, verify_password, create_access_token
-from app.dependencies import get_db
+from app.security import get_password_hash, verify_and_update_password, create_access_token
+from app.dependencies import get_db, get_async_db
 from datetime import timedelta
 from fastapi import APIRouter, HTTPException, Depends, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
@@ -38,15 +40,22 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == form_data.username).first()
-    if not db_user or not verify_password(form_data.password, db_user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(User).where(User.username == form_data.username))
+    valid, new_hash = await verify_and_update_password(
+        form_data.password, db_user.password_hash if db_user else None
+    )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
         )
-        
+    if new_hash:
+        # stored with outdated bcrypt parameters; upgrade while we have the password
+        db_user.password_hash = new_hash
+        await db.commit()
+
     access_token = create_access_token(
-        data={"sub": db_user.username, "role": db_user.role}
+        data={"sub": db_user.username, "uid": db_user.id, "role": db_user.role}
     )
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
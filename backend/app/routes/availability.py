@@ -5,25 +5,27 @@ from app.models import Availability, User
 from app.schemas import (
     AvailabilityCreate, 
     AvailabilityResponse, 
-    BusinessAvailabilityResponse
+    BusinessAvailabilityResponse,
+    Page
 )
-from app.dependencies import get_db, business_owner_required
-from typing import List
+from app.dependencies import get_db, business_owner_required, use_primary, current_user_db
+from app.schedules import schedule_cache
+from app.pagination import Keyset, PageParams
+from typing import List, Union
 
 router = APIRouter()
 
+# Weekly schedule order, served by ix_availability_owner_day_start
+AVAILABILITY_ORDER = Keyset(Availability.day_of_week, Availability.start_time, Availability.id)
+
 @router.post("/availability", response_model=AvailabilityResponse)
 def create_availability(
     availability: AvailabilityCreate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     """הוספת זמן זמינות חדש"""
-    # מציאת המשתמש לפי ה-username מה-token
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # בדיקה אם כבר קיים זמן זמינות שחופף
     existing_availability = db.query(Availability).filter(
         and_(
@@ -50,26 +52,26 @@ def create_availability(
     db.add(new_availability)
     db.commit()
     db.refresh(new_availability)
+    schedule_cache.invalidate(user.id)
     return new_availability
 
-@router.get("/my-availability", response_model=List[AvailabilityResponse])
+@router.get(
+    "/my-availability",
+    response_model=Union[List[AvailabilityResponse], Page[AvailabilityResponse]],
+    dependencies=[Depends(use_primary)]
+)
 def get_my_availability(
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     """קבלת כל זמני הזמינות של בעל העסק המחובר"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    availability = db.query(Availability).filter(
+    availability = AVAILABILITY_ORDER.apply(db.query(Availability).filter(
         Availability.owner_id == user.id
-    ).order_by(
-        Availability.day_of_week,
-        Availability.start_time
-    ).all()
+    ), page).all()
 
-    return availability
+    return page.wrap(*AVAILABILITY_ORDER.split(availability, page))
 
 @router.get("/business/{business_id}/availability", response_model=BusinessAvailabilityResponse)
 def get_business_availability(business_id: int, db: Session = Depends(get_db)):
@@ -99,13 +101,10 @@ def get_business_availability(business_id: int, db: Session = Depends(get_db)):
 def delete_availability(
     availability_id: int,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     """מחיקת זמן זמינות"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     availability = db.query(Availability).filter(
         Availability.id == availability_id,
         Availability.owner_id == user.id
@@ -119,5 +118,6 @@ def delete_availability(
 
     db.delete(availability)
     db.commit()
+    schedule_cache.invalidate(user.id)
 
     return {"message": "Availability slot deleted successfully"}
\ No newline at end of file
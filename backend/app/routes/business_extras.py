@@ -1,26 +1,49 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-from app.schemas import AppointmentResponse
+from typing import List, Optional, Union
+from datetime import datetime, date
+from app.schemas import AppointmentResponse, UtilizationResponse, Page
+from app.pagination import Keyset, PageParams
 from app.models import Appointment, User, Service
-from app.dependencies import get_db, check_user_role, get_current_user
-from sqlalchemy import and_, text
+from app.dependencies import get_db, get_async_db, check_user_role, get_current_user, use_primary, current_user_db, async_current_user_db
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.conflicts import day_bounds
+from app.schedules import WEEKDAYS
+from app.slots import weekly_utilization
 from typing import List
+import logging
+import numpy as np
 import pandas as pd
 from io import BytesIO
 from fastapi.responses import Response
 from fastapi.responses import StreamingResponse
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Business owners only access
 business_owner_required = check_user_role("business_owner")
 
-def check_business_ownership(business_id: int, current_user: dict, db: Session):
+# Longest range a single utilization request may cover
+MAX_UTILIZATION_DAYS = 366
+
+# Calendar orders, both served by ix_appointments_business_date_start
+CALENDAR_ORDER = Keyset(Appointment.date, Appointment.start_time, Appointment.id)
+CALENDAR_ORDER_NEWEST_FIRST = Keyset(Appointment.date, Appointment.start_time, Appointment.id, descending=True)
+
+def business_day_appointments(db: Session, business_id: int, day):
+    """Appointments of one business on one day, as a half-open range on the date index"""
+    day_start, day_end = day_bounds(day)
+    return db.query(Appointment).filter(
+        Appointment.business_id == business_id,
+        Appointment.date >= day_start,
+        Appointment.date < day_end
+    )
+
+def check_business_ownership(business_id: int, user: User):
     """Helper function to check if the current user owns the business"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user or user.id != business_id:
+    if user.id != business_id:
         raise HTTPException(
             status_code=403,
             detail="You don't have permission to access this business's data"
@@ -30,21 +53,17 @@ def check_business_ownership(business_id: int, current_user: dict, db: Session):
 
 @router.get("/appointments/export")
 async def export_appointments_to_excel(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(async_current_user_db)
 ):
     try:
-        print("Starting export process...")
-        user = db.query(User).filter(User.username == current_user["sub"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        services = db.query(Service).filter(Service.owner_id == user.id).all()
-        service_names = [service.name for service in services]
-
-        appointments = db.query(Appointment).filter(
-            Appointment.type.in_(service_names)
-        ).order_by(Appointment.date, Appointment.start_time).all()
+        logger.debug("Exporting appointments for %s", current_user["sub"])
+        appointments = (await db.scalars(
+            select(Appointment).where(
+                Appointment.business_id == user.id
+            ).order_by(Appointment.date, Appointment.start_time)
+        )).all()
 
         data = []
         for apt in appointments:
@@ -89,23 +108,58 @@ async def export_appointments_to_excel(
         )
 
     except Exception as e:
-        print(f"Export error: {str(e)}")
+        logger.exception("Export failed for %s", current_user["sub"])
         raise HTTPException(
             status_code=500,
             detail=str(e)
         )
 
-@router.get("/appointments/{appointment_id}")
+@router.get("/appointments/utilization", response_model=UtilizationResponse)
+def get_appointments_utilization(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
+):
+    """Booked vs. available minutes per weekday and hour over a date range"""
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (date_to - date_from).days >= MAX_UTILIZATION_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range is limited to {MAX_UTILIZATION_DAYS} days"
+        )
+
+    booked, available = weekly_utilization(db, user.id, date_from, date_to)
+    ratio = np.divide(booked, available, out=np.zeros(booked.shape), where=available > 0).round(4)
+
+    return {
+        "business_id": user.id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "weekdays": list(WEEKDAYS),
+        "booked_minutes": booked.tolist(),
+        "available_minutes": available.tolist(),
+        "utilization": [
+            [value if minutes else None for value, minutes in zip(ratios, hours)]
+            for ratios, hours in zip(ratio.tolist(), available.tolist())
+        ]
+    }
+
+@router.get("/appointments/{appointment_id}", dependencies=[Depends(use_primary)])
 def get_appointment_details(
     appointment_id: int,
     business_id: int,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
-    check_business_ownership(business_id, current_user, db)
+    check_business_ownership(business_id, user)
     
     appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id
+        Appointment.id == appointment_id,
+        Appointment.business_id == business_id
     ).first()
     
     if not appointment:
@@ -113,37 +167,33 @@ def get_appointment_details(
         
     return appointment
 
-@router.get("/appointments")
+@router.get("/appointments", dependencies=[Depends(use_primary)])
 def list_appointments(
     business_id: int,
     title: Optional[str] = None,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
-    check_business_ownership(business_id, current_user, db)
+    check_business_ownership(business_id, user)
     
-    query = db.query(Appointment)
+    query = db.query(Appointment).filter(Appointment.business_id == business_id)
     if title:
         query = query.filter(Appointment.title == title)
     
-    return query.all()
+    return page.wrap(*CALENDAR_ORDER.split(CALENDAR_ORDER.apply(query, page).all(), page))
 
 @router.get("/appointments/search/{phone}")
 def search_appointment(
    phone: str,
    db: Session = Depends(get_db),
-   current_user: dict = Depends(business_owner_required)
+   current_user: dict = Depends(business_owner_required),
+   user: User = Depends(current_user_db)
 ):
-   user = db.query(User).filter(User.username == current_user["sub"]).first()
-   if not user:
-       raise HTTPException(status_code=404, detail="User not found")
-
-   services = db.query(Service).filter(Service.owner_id == user.id).all()
-   service_names = [service.name for service in services]
-
    appointments = db.query(Appointment).filter(
-       Appointment.customer_phone.contains(phone),
-       Appointment.type.in_(service_names)
+       Appointment.business_id == user.id,
+       Appointment.customer_phone.contains(phone)
    ).all()
    
    if not appointments:
@@ -158,22 +208,13 @@ def search_appointment(
 def get_appointments_stats(
     date: str,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     try:
-        user = db.query(User).filter(User.username == current_user["sub"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
         target_date = datetime.strptime(date, "%m-%d-%Y").date()
         
-        services = db.query(Service).filter(Service.owner_id == user.id).all()
-        service_names = [service.name for service in services]
-
-        appointments = db.query(Appointment).filter(
-            text("DATE(date) = DATE(:target_date)"),
-            Appointment.type.in_(service_names)
-        ).params(target_date=target_date).all()
+        appointments = business_day_appointments(db, user.id, target_date).all()
 
         if not appointments:
             raise HTTPException(
@@ -207,21 +248,16 @@ def get_appointments_stats(
             detail="Invalid date format. Please use MM-DD-YYYY format.")
 
 
-@router.get("/my-appointments", response_model=List[AppointmentResponse])
+@router.get("/my-appointments", response_model=Union[List[AppointmentResponse], Page[AppointmentResponse]])
 async def get_business_appointments(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(async_current_user_db)
 ):
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    appointments = db.query(Appointment).join(
-        Service, 
-        and_(
-            Service.name == Appointment.type,
-            Service.owner_id == user.id
-        )
-    ).order_by(Appointment.date.desc()).all()
+    appointments = (await db.scalars(CALENDAR_ORDER_NEWEST_FIRST.apply(
+        select(Appointment).where(Appointment.business_id == user.id),
+        page
+    ))).all()
 
-    return appointments
+    return page.wrap(*CALENDAR_ORDER_NEWEST_FIRST.split(appointments, page))
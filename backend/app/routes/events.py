@@ -0,0 +1,84 @@
+import asyncio
+import os
+from datetime import timedelta
+from typing import Optional
+
+import jwt
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from jwt import PyJWTError
+from app.dependencies import business_owner_required, get_current_user
+from app.events import event_hub, Subscription
+from app.security import ALGORITHM, SECRET_KEY, create_access_token
+
+router = APIRouter()
+
+# Comment line sent on an idle stream so proxies don't time it out
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# How long a stream ticket can be used to connect
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", "60"))
+EVENTS_TICKET_SCOPE = "events"
+
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+def stream_owner(
+    ticket: Optional[str] = Query(None, description="From POST /ticket, for clients that can't send headers"),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> dict:
+    """The business owner opening a stream, by bearer token or ?ticket="""
+    if ticket is None:
+        if token is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        return business_owner_required(get_current_user(token))
+    try:
+        claims = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    if claims.get("scope") != EVENTS_TICKET_SCOPE:
+        raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+    return business_owner_required(claims)
+
+async def event_stream(subscription: Subscription):
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        event_hub.unsubscribe(subscription)
+
+@router.post("/ticket")
+def create_stream_ticket(current_user: dict = Depends(business_owner_required)):
+    """
+    A short-lived ticket for opening the stream as /stream?ticket=..., since
+    a browser EventSource cannot send an Authorization header. A ticket is
+    rejected everywhere else.
+    """
+    if "uid" not in current_user:
+        raise HTTPException(status_code=401, detail="Please log in again to receive live updates")
+    ticket = create_access_token(
+        data={key: current_user[key] for key in ("sub", "role", "uid")} | {"scope": EVENTS_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=EVENTS_TICKET_SECONDS)
+    )
+    return {"ticket": ticket, "expires_in": EVENTS_TICKET_SECONDS}
+
+@router.get("/stream")
+async def stream_events(current_user: dict = Depends(stream_owner)):
+    """
+    Server-Sent Events for the logged-in business owner: `message` when a
+    customer sends a message, `appointment` when a booking is made. Each
+    event's data has the same shape as the items of my-messages and
+    my-appointments. Authenticate with a bearer token or a ticket from
+    POST /ticket.
+    """
+    # no database session here: it would stay checked out for as long as the stream is open
+    if "uid" not in current_user:
+        raise HTTPException(status_code=401, detail="Please log in again to receive live updates")
+    return StreamingResponse(
+        event_stream(event_hub.subscribe(current_user["uid"])),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from app.database import pool_monitors
+from app.dependencies import internal_token_required
+from app.query_stats import route_query_totals
+
+router = APIRouter(dependencies=[Depends(internal_token_required)])
+
+@router.get("/pool")
+def get_pool_stats():
+    """Connection pool usage and wait statistics per engine"""
+    return {name: monitor.stats() for name, monitor in pool_monitors.items()}
+
+@router.get("/queries")
+def get_query_stats():
+    """SQL statements and DB time per route template since startup"""
+    return route_query_totals.snapshot()
+
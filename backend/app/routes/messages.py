@@ -1,39 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.dependencies import get_db, get_current_user, business_owner_required
-from app.models import Message, User
-from app.schemas import MessageCreate, MessageResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_async_db, business_owner_required, use_primary, async_current_user_db
+from app.models import Message, UnreadCounter, User
+from app.unread import adjust_unread
+from app.events import event_hub
+from app.schemas import BulkResult, MessageCreate, MessageResponse, MessageSelection, MessageTitle, Page
+from app.pagination import Keyset, PageParams, RequiredPageParams
+from app.message_search import inbox_search, search_terms
 from datetime import datetime
-from typing import List
-from sqlalchemy import desc
+from typing import List, Optional, Union
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import joinedload
+import logging
 import pytz
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+INBOX_ORDER = Keyset(Message.created_at, Message.id, descending=True)
+
+def inbox_item(msg: Message, recipient_name: str) -> MessageResponse:
+    return MessageResponse(
+        id=msg.id,
+        title=msg.title,
+        content=msg.content,
+        created_at=msg.created_at,
+        read=msg.read,
+        sender_name=f"{msg.sender.first_name} {msg.sender.last_name}",
+        recipient_name=recipient_name
+    )
 
 @router.post("/send/{business_id}", response_model=MessageResponse)
 async def send_message_to_business(
     business_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    sender: User = Depends(async_current_user_db)
 ):
     """Send a message to a specific business owner"""
     try:
-        print(f"Looking for sender with username: {current_user['sub']}")
-        sender = db.query(User).filter(User.username == current_user["sub"]).first()
-        if not sender:
-            raise HTTPException(status_code=404, detail="Sender not found")
-        
-        print(f"Sender found: {sender.first_name} {sender.last_name}, role: {sender.role}")
         if sender.role != "customer":
             raise HTTPException(status_code=403, detail="Only customers can send messages to businesses")
         
-        print(f"Looking for business owner with ID: {business_id}")
-        recipient = db.query(User).filter(
+        recipient = await db.scalar(select(User).where(
             User.id == business_id,
             User.role == "business_owner"
-        ).first()
+        ))
         
         if not recipient:
             raise HTTPException(
@@ -41,13 +54,10 @@ async def send_message_to_business(
                 detail=f"Business owner with ID {business_id} not found"
             )
         
-        print(f"Recipient found: {recipient.first_name} {recipient.last_name}")
-        
         # Create new message with Israel timezone
         israel_tz = pytz.timezone('Asia/Jerusalem')
         current_time = datetime.now() 
         
-        print(f"Creating message with title: {message.title}")
         db_message = Message(
             sender_id=sender.id,
             recipient_id=recipient.id,
@@ -58,8 +68,9 @@ async def send_message_to_business(
         )
         
         db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
+        await adjust_unread(db, recipient.id, 1)
+        await db.commit()
+        await db.refresh(db_message)
         
         response = MessageResponse(
             id=db_message.id,
@@ -71,74 +82,82 @@ async def send_message_to_business(
             recipient_name=f"{recipient.first_name} {recipient.last_name}"
         )
         
-        print(f"Message created successfully: {response}")
+        logger.debug("Message %d sent from user %d to business %d", db_message.id, sender.id, recipient.id)
+        event_hub.publish(recipient.id, "message", response.model_dump(mode="json"))
         return response
         
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error creating message: {str(e)}")
-        db.rollback()
+        logger.exception("Error creating message for business %d", business_id)
+        await db.rollback()
         raise HTTPException(
             status_code=500, 
             detail=f"Error creating message: {str(e)}"
         )
 
-@router.get("/my-messages", response_model=List[MessageResponse])
+@router.get(
+    "/my-messages",
+    response_model=Union[List[MessageResponse], Page[MessageResponse]],
+    dependencies=[Depends(use_primary)]
+)
 async def get_my_messages(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(async_current_user_db)
 ):
-    """Get all messages for the current business owner"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+    """Messages for the current business owner, newest first; pass limit/cursor to page through them"""
     if user.role != "business_owner":
         raise HTTPException(status_code=403, detail="Only business owners can view their messages")
     
-    # Get all messages sent to this business owner
-    messages = db.query(Message).filter(
-        Message.recipient_id == user.id
-    ).order_by(desc(Message.created_at)).all()
+    # senders come from the same query
+    messages = (await db.scalars(INBOX_ORDER.apply(
+        select(Message).options(joinedload(Message.sender)).where(Message.recipient_id == user.id),
+        page
+    ))).all()
+    messages, next_cursor = INBOX_ORDER.split(messages, page)
     
-    # Add sender names to response
-    response_messages = []
-    for msg in messages:
-        sender = db.query(User).filter(User.id == msg.sender_id).first()
-        
-        # Create MessageResponse object with all required fields
-        message_response = MessageResponse(
-            id=msg.id,
-            title=msg.title,
-            content=msg.content,
-            created_at=msg.created_at,
-            read=msg.read,
-            sender_name=f"{sender.first_name} {sender.last_name}",
-            recipient_name=f"{user.first_name} {user.last_name}"
-        )
-        response_messages.append(message_response)
+    recipient_name = f"{user.first_name} {user.last_name}"
+    return page.wrap([inbox_item(msg, recipient_name) for msg in messages], next_cursor)
+
+@router.get("/search", response_model=Page[MessageResponse])
+async def search_my_messages(
+    q: str = Query(..., min_length=1, max_length=200, description="Words the message content must contain"),
+    title: Optional[MessageTitle] = None,
+    page: RequiredPageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(async_current_user_db)
+):
+    """Search the current business owner's messages, most relevant first"""
+    if user.role != "business_owner":
+        raise HTTPException(status_code=403, detail="Only business owners can search their messages")
     
-    return response_messages
+    terms = search_terms(q)
+    if not terms:
+        return page.wrap([], None)
+    query, order = inbox_search(db.get_bind().dialect.name, user.id, terms)
+    if title is not None:
+        query = query.where(Message.title == title.value)
+    rows = (await db.execute(order.apply(query.options(joinedload(Message.sender)), page))).all()
+    rows, next_cursor = order.split(rows, page)
+    
+    recipient_name = f"{user.first_name} {user.last_name}"
+    return page.wrap([inbox_item(row.Message, recipient_name) for row in rows], next_cursor)
 
 @router.patch("/messages/{message_id}/read")
 async def mark_message_as_read(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(async_current_user_db)
 ):
     """Mark a message as read"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     if user.role != "business_owner":
         raise HTTPException(status_code=403, detail="Only business owners can mark messages as read")
     
-    message = db.query(Message).filter(
+    message = await db.scalar(select(Message).where(
         Message.id == message_id,
         Message.recipient_id == user.id
-    ).first()
+    ))
     
     if not message:
         raise HTTPException(
@@ -146,43 +165,100 @@ async def mark_message_as_read(
             detail="Message not found or you don't have permission to mark it as read"
         )
     
-    message.read = True
-    db.commit()
+    # only the request that flips read decrements the counter
+    flipped = (await db.execute(
+        update(Message).where(Message.id == message.id, Message.read == False).values(read=True)
+    )).rowcount
+    if flipped:
+        await adjust_unread(db, user.id, -1)
+    await db.commit()
     
     return {"message": "Message marked as read"}
 
-@router.get("/unread-count")
+def selected(selection: MessageSelection, recipient_id: int) -> list:
+    """WHERE clauses for the messages a bulk action targets, never outside the recipient's inbox"""
+    clauses = [Message.recipient_id == recipient_id]
+    if selection.ids is not None:
+        clauses.append(Message.id.in_(selection.ids))
+    if selection.sender_id is not None:
+        clauses.append(Message.sender_id == selection.sender_id)
+    if selection.title is not None:
+        clauses.append(Message.title == selection.title.value)
+    if selection.read is not None:
+        clauses.append(Message.read == selection.read)
+    if selection.before is not None:
+        clauses.append(Message.created_at < selection.before)
+    return clauses
+
+@router.patch("/messages/read", response_model=BulkResult)
+async def mark_messages_as_read(
+    selection: MessageSelection,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(async_current_user_db)
+):
+    """Mark every selected message as read in one statement; returns how many were unread"""
+    flipped = (await db.execute(
+        update(Message).where(*selected(selection, user.id), Message.read == False)
+        .values(read=True).execution_options(synchronize_session=False)
+    )).rowcount
+    if flipped:
+        await adjust_unread(db, user.id, -flipped)
+    await db.commit()
+    
+    return {"count": flipped}
+
+@router.post("/messages/delete", response_model=BulkResult)
+async def delete_messages(
+    selection: MessageSelection,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(async_current_user_db)
+):
+    """Delete every selected message; returns how many were deleted"""
+    clauses = selected(selection, user.id)
+    # unread ones go first so the counter drops by exactly what was deleted
+    unread = (await db.execute(
+        delete(Message).where(*clauses, Message.read == False).execution_options(synchronize_session=False)
+    )).rowcount
+    if unread:
+        await adjust_unread(db, user.id, -unread)
+    read = 0
+    if selection.read is not False:
+        read = (await db.execute(
+            delete(Message).where(*clauses).execution_options(synchronize_session=False)
+        )).rowcount
+    await db.commit()
+    
+    return {"count": unread + read}
+
+@router.get("/unread-count", dependencies=[Depends(use_primary)])
 async def get_unread_messages_count(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(async_current_user_db)
 ):
     """Get count of unread messages for business owner"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user or user.role != "business_owner":
+    if user.role != "business_owner":
         return {"unread_count": 0}
     
-    count = db.query(Message).filter(
-        Message.recipient_id == user.id,
-        Message.read == False
-    ).count()
+    count = await db.scalar(select(UnreadCounter.unread).where(UnreadCounter.user_id == user.id))
     
-    return {"unread_count": count}
+    return {"unread_count": count or 0}
 
 
 
 @router.delete("/messages/{message_id}")
 async def delete_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(async_current_user_db)
 ):
     """Delete a message (business owners only)"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    
-    message = db.query(Message).filter(
+    message = await db.scalar(select(Message).where(
         Message.id == message_id,
         Message.recipient_id == user.id
-    ).first()
+    ))
     
     if not message:
         raise HTTPException(
@@ -190,7 +266,13 @@ async def delete_message(
             detail="Message not found or you don't have permission to delete it"
         )
     
-    db.delete(message)
-    db.commit()
+    unread = (await db.execute(
+        delete(Message).where(Message.id == message.id, Message.read == False)
+    )).rowcount
+    if unread:
+        await adjust_unread(db, user.id, -1)
+    else:
+        await db.execute(delete(Message).where(Message.id == message.id))
+    await db.commit()
     
     return {"message": "Message deleted successfully"}
\ No newline at end of file
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 import re
-from typing import List
+from typing import List, Union
+from app.pagination import Keyset, PageParams
 from app.models import Topic, Service
 from app.models import Availability
 from openai import OpenAI
@@ -13,28 +16,37 @@ from app.schemas import (
     ServiceUpdate, 
     ServiceResponse,
     BusinessResponse,
+    Page,
     SearchQuery
 )
-from app.dependencies import get_db, business_owner_required, get_current_user
+from app.dependencies import get_db, get_async_db, business_owner_required, get_current_user, use_primary, current_user_db
 from app.models import User
 from app.models import Service
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 import httpx
 import json 
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-@router.get("/public/businesses", response_model=List[BusinessResponse])
-def get_all_businesses(db: Session = Depends(get_db)):
+# Public catalog order, served by ix_users_role
+BUSINESS_ORDER = Keyset(User.id)
+
+@router.get("/public/businesses", response_model=Union[List[BusinessResponse], Page[BusinessResponse]])
+def get_all_businesses(page: PageParams = Depends(), db: Session = Depends(get_db)):
     """Get all users who are business owners with their services"""
-    businesses = db.query(User).filter(User.role == "business_owner").all()
-    return businesses
+    businesses = BUSINESS_ORDER.apply(db.query(User).filter(User.role == "business_owner").options(
+        selectinload(User.services).selectinload(Service.topics)
+    ), page).all()
+    return page.wrap(*BUSINESS_ORDER.split(businesses, page))
 
 @router.get("/public/businesses/{business_id}/services", response_model=List[ServiceResponse])
 def get_business_services(business_id: int, db: Session = Depends(get_db)):
     """Get all services for a specific business"""
-    services = db.query(Service).filter(Service.owner_id == business_id).all()
+    services = db.query(Service).filter(Service.owner_id == business_id).options(
+        selectinload(Service.topics)
+    ).all()
     if not services:
         raise HTTPException(status_code=404, detail="No services found for this business")
     return services
@@ -57,15 +69,10 @@ def get_business_availability(business_id: int, db: Session = Depends(get_db)):
 def create_service(
     service: ServiceCreate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     """Create a new service (only for business owners)"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    print(f"Creating service for user ID: {user.id}")
-
     new_service = Service(
         name=service.name,
         duration=service.duration,
@@ -77,24 +84,22 @@ def create_service(
     db.commit()
     db.refresh(new_service)
     
-    print(f"Created service: {new_service.id} for owner: {new_service.owner_id}")
+    logger.info("Created service %d for owner %d", new_service.id, new_service.owner_id)
     
     return new_service
 
 
-@router.get("/my-services", response_model=List[ServiceResponse])
+@router.get("/my-services", response_model=List[ServiceResponse], dependencies=[Depends(use_primary)])
 def get_my_services(
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
     """Get all services for the logged-in business owner"""
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    services = db.query(Service).filter(Service.owner_id == user.id).all()
-    
-    print(f"Looking for services for user ID: {user.id}")
-    print(f"Found services: {services}")
+    services = db.query(Service).filter(Service.owner_id == user.id).options(
+        selectinload(Service.topics)
+    ).all()
+    logger.debug("Found %d services for owner %d", len(services), user.id)
     
     return services
 
@@ -104,12 +109,9 @@ def update_service(
     service_id: int,
     service_update: ServiceUpdate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     service = db.query(Service).filter(
         Service.id == service_id,
         Service.owner_id == user.id  
@@ -137,12 +139,9 @@ def update_service(
 def delete_service(
     service_id: int,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(business_owner_required)
+    current_user: dict = Depends(business_owner_required),
+    user: User = Depends(current_user_db)
 ):
-    user = db.query(User).filter(User.username == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     service = db.query(Service).filter(
         Service.id == service_id,
         Service.owner_id == user.id 
@@ -207,29 +206,18 @@ def search_businesses(query: str, businesses_data: list) -> list:
     
     return sorted(matching_businesses, key=lambda x: x["score"], reverse=True)
 
-@router.get("/public/businesses", response_model=List[BusinessResponse])
-def get_all_businesses(db: Session = Depends(get_db)):
-    """Get all users who are business owners with their services"""
-    businesses = db.query(User).filter(User.role == "business_owner").all()
-    return businesses
-
-@router.get("/public/businesses/{business_id}/services", response_model=List[ServiceResponse])
-def get_business_services(business_id: int, db: Session = Depends(get_db)):
-    """Get all services for a specific business"""
-    services = db.query(Service).filter(Service.owner_id == business_id).all()
-    if not services:
-        raise HTTPException(status_code=404, detail="No services found for this business")
-    return services
 
 @router.post("/smart-service-search")
-async def smart_service_search(query: SearchQuery, db: Session = Depends(get_db)):
+async def smart_service_search(query: SearchQuery, db: AsyncSession = Depends(get_async_db)):
     """
     Search for businesses and services using LLM service
     """
     try:
-        businesses = db.query(User).filter(
-            User.role == "business_owner"
-        ).all()
+        businesses = (await db.scalars(
+            select(User).where(
+                User.role == "business_owner"
+            ).options(selectinload(User.services))
+        )).all()
         
         businesses_data = [{
             "id": business.id,
@@ -245,7 +233,7 @@ async def smart_service_search(query: SearchQuery, db: Session = Depends(get_db)
         } for business in businesses]
 
         llm_url = "http://llm_service:8001/analyze-query"
-        print(f"Connecting to LLM service at: {llm_url}")
+        logger.debug("Sending search to %s", llm_url)
         
         async with httpx.AsyncClient() as client:
             try:
@@ -261,7 +249,7 @@ async def smart_service_search(query: SearchQuery, db: Session = Depends(get_db)
                 
                 if llm_response.status_code == 200:
                     llm_data = llm_response.json()
-                    print(f"LLM service response: {llm_data}")
+                    logger.debug("LLM service returned %d matches", len(llm_data.get("matches", [])))
                     
                     if "matches" in llm_data:
                         return {
@@ -270,21 +258,21 @@ async def smart_service_search(query: SearchQuery, db: Session = Depends(get_db)
                     else:
                         return {"matches": []}
                 else:
-                    print(f"LLM service error: {llm_response.text}")
+                    logger.warning("LLM service returned %d: %s", llm_response.status_code, llm_response.text)
                     raise HTTPException(
                         status_code=llm_response.status_code,
                         detail=f"LLM service error: {llm_response.text}"
                     )
                     
             except httpx.RequestError as e:
-                print(f"Connection error to LLM service: {str(e)}")
+                logger.warning("Connection error to LLM service: %s", e)
                 raise HTTPException(
                     status_code=503,
                     detail=f"Error connecting to LLM service: {str(e)}"
                 )
             
     except Exception as e:
-        print(f"Unexpected error in smart_service_search: {str(e)}")
+        logger.exception("Unexpected error in smart_service_search")
         raise HTTPException(
             status_code=500,
             detail=f"Error performing search: {str(e)}"
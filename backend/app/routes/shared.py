@@ -1,31 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas import AppointmentCreate, AppointmentUpdate, UserResponse
-from app.models import Service, Appointment, Availability, User, Topic
-from app.utils import is_time_conflict
-from app.dependencies import get_current_user
-from sqlalchemy.orm import Session
-from app.database import get_db
-from datetime import datetime, timedelta 
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.schemas import (
+    AppointmentCreate,
+    AppointmentBatchCreate,
+    AppointmentSeriesCreate,
+    RecurrenceFrequency,
+    MAX_SERIES_OCCURRENCES,
+    AppointmentUpdate,
+    UserResponse,
+    FreeSlotsResponse,
+    EarliestSlot
+)
+from app.models import Service, Appointment, AppointmentSeries, Availability, User, Topic
+from app.utils import (
+    is_time_conflict,
+    check_time_slot,
+    recurrence_dates,
+    to_local_naive,
+    NO_AVAILABILITY,
+    OUTSIDE_HOURS,
+    APPOINTMENT_CONFLICT
+)
+from app.conflicts import conflict_index, to_minutes
+from app.slots import find_free_slots, iter_free_slots, check_bookings, BATCH_CONFLICT
+from app.reservations import committed_conflict, lock_days
+from app.dependencies import get_current_user, use_primary, async_current_user_db
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_async_db
+from datetime import datetime, timedelta, date
+from heapq import merge
+from itertools import islice
+from sqlalchemy import select
 from app.models import Availability, Service, User
-from typing import List
-from app.schemas import AppointmentResponse
+from typing import List, Union
+from app.schemas import AppointmentResponse, Page
+from app.pagination import Keyset, PageParams
+from app.events import event_hub
 from app.schemas import UserResponse
-from sqlalchemy.sql import text
 
 
 router = APIRouter()
 
+# Longest range a single free-slots request may cover
+MAX_FREE_SLOT_DAYS = 62
+
+# Longest window the cross-business earliest-slot search may cover
+MAX_EARLIEST_SLOT_DAYS = 31
+
+# A customer's bookings across businesses, newest first, walking ix_appointments_date
+CUSTOMER_APPOINTMENTS_ORDER = Keyset(Appointment.date, Appointment.id, descending=True)
+
+BOOKING_ERRORS = {
+    NO_AVAILABILITY: "The business is not available on this day. Please choose another day.",
+    OUTSIDE_HOURS: "This time is outside business hours.",
+    APPOINTMENT_CONFLICT: "This time slot conflicts with an existing appointment. Please select a different time.",
+    BATCH_CONFLICT: "This time slot conflicts with another appointment in the same batch."
+}
+
 @router.post("/appointments")
 def create_appointment(
     appointment: AppointmentCreate,
     business_id: int,
     db: Session = Depends(get_db)
 ):
-    print("\n=== CREATE APPOINTMENT DEBUG ===")
-    print(f"Requested date: {appointment.date}")
-    print(f"Requested time: {appointment.start_time}")
-
     service = db.query(Service).filter(
         Service.name == appointment.title,
         Service.owner_id == business_id
@@ -50,7 +87,7 @@ def create_appointment(
                        + timedelta(minutes=service.duration)).time()
 
     # Check business availability and time conflicts
-    has_conflict = is_time_conflict(
+    reason = check_time_slot(
         start_time=appointment_time,
         duration=service.duration,
         date=appointment_date,
@@ -58,40 +95,21 @@ def create_appointment(
         owner_id=business_id
     )
 
-    if has_conflict:
-        # Check if it's due to no availability
+    if reason == NO_AVAILABILITY:
         day_of_week = appointment.date.strftime("%A")
-        availability = db.query(Availability).filter(
-            and_(
-                Availability.owner_id == business_id,
-                Availability.day_of_week == day_of_week
-            )
-        ).first()
-
-        if not availability:
-            raise HTTPException(
-                status_code=400,
-                detail=f"The business is not available on {day_of_week}s. Please choose another day."
-            )
-
-        # Check for existing appointments at the same time
-        existing_appointments = db.query(Appointment).filter(
-            text("DATE(date) = DATE(:check_date)")
-        ).params(check_date=appointment_date).all()
-
-        for apt in existing_appointments:
-            existing_start = datetime.combine(appointment.date.date(), apt.start_time)
-            existing_end = existing_start + timedelta(minutes=apt.duration)
-            new_start = datetime.combine(appointment.date.date(), appointment.start_time)
-            new_end = new_start + timedelta(minutes=service.duration)
+        raise HTTPException(
+            status_code=400,
+            detail=f"The business is not available on {day_of_week}s. Please choose another day."
+        )
 
-            if (new_start < existing_end and new_end > existing_start):
-                raise HTTPException(
-                    status_code=400,
-                    detail="This time slot conflicts with an existing appointment. Please select a different time."
-                )
+    if reason == APPOINTMENT_CONFLICT:
+        raise HTTPException(
+            status_code=400,
+            detail="This time slot conflicts with an existing appointment. Please select a different time."
+        )
 
-        # If we get here, it means the time is outside business hours
+    if reason == OUTSIDE_HOURS:
+        day_of_week = appointment.date.strftime("%A")
         available_slots = db.query(Availability).filter(
             Availability.owner_id == business_id,
             Availability.day_of_week == day_of_week
@@ -110,6 +128,8 @@ def create_appointment(
 
     # Create new appointment
     new_appointment = Appointment(
+        business_id=business_id,
+        service_id=service.id,
         date=appointment.date.date(),
         start_time=appointment.start_time,
         duration=service.duration,
@@ -121,14 +141,37 @@ def create_appointment(
         notes=None
     )
 
+    start_minutes = to_minutes(appointment.start_time)
+    booking_day = appointment.date.date()
     try:
+        lock_days(db, business_id, [booking_day])
+        if committed_conflict(db, business_id, [(booking_day, start_minutes, service.duration)]):
+            # another request booked an overlapping time since the check above
+            db.rollback()
+            conflict_index.invalidate(business_id, booking_day)
+            raise HTTPException(
+                status_code=400,
+                detail=BOOKING_ERRORS[APPOINTMENT_CONFLICT]
+            )
         db.add(new_appointment)
         db.commit()
         db.refresh(new_appointment)
+        conflict_index.add(
+            business_id,
+            booking_day,
+            start_minutes,
+            start_minutes + new_appointment.duration,
+            new_appointment.id
+        )
+        event_hub.publish(
+            business_id, "appointment", AppointmentResponse.model_validate(new_appointment).model_dump(mode="json")
+        )
         return {
             "message": f"Appointment created successfully for {appointment_time}-{service_end_time.strftime('%H:%M')}",
             "appointment": new_appointment
         }
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -137,6 +180,205 @@ def create_appointment(
         )
     
 
+def save_appointments(db: Session, business_id: int, appointments: List[Appointment]) -> List[AppointmentResponse]:
+    """
+    Insert validated appointments of one business in one transaction, under
+    the booking lock of their days. Returns them serialized, in the same order.
+    """
+    if not appointments:
+        return []
+
+    bookings = [(apt.date.date(), to_minutes(apt.start_time), apt.duration) for apt in appointments]
+    booked_days = {day for day, _, _ in bookings}
+    try:
+        lock_days(db, business_id, booked_days)
+        if committed_conflict(db, business_id, bookings):
+            db.rollback()
+            for day in booked_days:
+                conflict_index.invalidate(business_id, day)
+            raise HTTPException(
+                status_code=409,
+                detail="Some of these time slots were just booked by another request. Please retry."
+            )
+        db.add_all(appointments)
+        db.flush()
+        # serialize before commit expires the instances
+        saved = [AppointmentResponse.model_validate(apt) for apt in appointments]
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while creating the appointments: {str(e)}"
+        )
+
+    for apt in saved:
+        start_minutes = to_minutes(apt.start_time)
+        conflict_index.add(
+            business_id,
+            apt.date.date(),
+            start_minutes,
+            start_minutes + apt.duration,
+            apt.id
+        )
+        event_hub.publish(business_id, "appointment", apt.model_dump(mode="json"))
+    return saved
+
+
+@router.post("/appointments/batch")
+def create_appointments_batch(
+    batch: AppointmentBatchCreate,
+    business_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Book many appointments for one business in a single transaction.
+    Every item is validated in one pass; the valid ones are inserted together
+    and the response reports success or the error for each item.
+    """
+    services = {
+        service.name: service
+        for service in db.query(Service).filter(Service.owner_id == business_id).all()
+    }
+
+    results = [None] * len(batch.appointments)
+    to_check = []
+    for index, item in enumerate(batch.appointments):
+        service = services.get(item.title)
+        if not service:
+            results[index] = {
+                "index": index,
+                "success": False,
+                "error": f"Invalid service: '{item.title}'. Service must be one of the available services."
+            }
+            continue
+        to_check.append((index, item, service))
+
+    reasons = check_bookings(db, business_id, [
+        (item.date.date(), to_minutes(item.start_time), service.duration)
+        for _, item, service in to_check
+    ])
+
+    new_appointments = []
+    for (index, item, service), reason in zip(to_check, reasons):
+        if reason:
+            results[index] = {"index": index, "success": False, "error": BOOKING_ERRORS[reason]}
+            continue
+        new_appointments.append((index, Appointment(
+            business_id=business_id,
+            service_id=service.id,
+            date=datetime.combine(item.date.date(), datetime.min.time()),
+            start_time=item.start_time,
+            duration=service.duration,
+            title=service.name,
+            customer_name=item.customer_name,
+            customer_phone=item.customer_phone,
+            type=service.name,
+            cost=service.price,
+            notes=None
+        )))
+
+    saved = save_appointments(db, business_id, [apt for _, apt in new_appointments])
+    for (index, _), appointment in zip(new_appointments, saved):
+        results[index] = {"index": index, "success": True, "appointment": appointment}
+
+    return {
+        "created": len(new_appointments),
+        "failed": len(results) - len(new_appointments),
+        "results": results
+    }
+
+
+@router.post("/appointments/series")
+def create_appointment_series(
+    series: AppointmentSeriesCreate,
+    business_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Book a recurring appointment. All occurrences are checked in one pass and
+    the bookable ones are inserted together; the response lists every
+    occurrence with its appointment or the reason it could not be booked.
+    """
+    service = db.query(Service).filter(
+        Service.name == series.title,
+        Service.owner_id == business_id
+    ).first()
+    if not service:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid service: '{series.title}'. Service must be one of the available services."
+        )
+
+    interval_days = {
+        RecurrenceFrequency.WEEKLY: 7,
+        RecurrenceFrequency.BIWEEKLY: 14
+    }.get(series.frequency, series.interval_days)
+    first_day = series.date.date()
+    if series.until is not None and series.until.date() < first_day:
+        raise HTTPException(status_code=400, detail="'until' must not be before the first occurrence")
+
+    days = recurrence_dates(
+        first_day,
+        interval_days,
+        until=series.until.date() if series.until else None,
+        count=series.count,
+        limit=MAX_SERIES_OCCURRENCES
+    )
+    if len(days) > MAX_SERIES_OCCURRENCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A series is limited to {MAX_SERIES_OCCURRENCES} occurrences"
+        )
+
+    start_minutes = to_minutes(series.start_time)
+    reasons = check_bookings(db, business_id, [(day, start_minutes, service.duration) for day in days])
+
+    db_series = AppointmentSeries(
+        business_id=business_id,
+        service_id=service.id,
+        first_date=datetime.combine(first_day, datetime.min.time()),
+        start_time=series.start_time,
+        interval_days=interval_days,
+        customer_name=series.customer_name,
+        customer_phone=series.customer_phone
+    )
+    bookable = [
+        Appointment(
+            business_id=business_id,
+            service_id=service.id,
+            series=db_series,
+            date=datetime.combine(day, datetime.min.time()),
+            start_time=series.start_time,
+            duration=service.duration,
+            title=service.name,
+            customer_name=series.customer_name,
+            customer_phone=series.customer_phone,
+            type=service.name,
+            cost=service.price,
+            notes=None
+        )
+        for day, reason in zip(days, reasons) if reason is None
+    ]
+    saved = iter(save_appointments(db, business_id, bookable))
+
+    occurrences = []
+    for day, reason in zip(days, reasons):
+        if reason:
+            occurrences.append({"date": day, "success": False, "error": BOOKING_ERRORS[reason]})
+        else:
+            occurrences.append({"date": day, "success": True, "appointment": next(saved)})
+
+    return {
+        "series_id": db_series.id if bookable else None,
+        "created": len(bookable),
+        "failed": len(days) - len(bookable),
+        "occurrences": occurrences
+    }
+
+
 @router.put("/appointments/{appointment_id}")  
 def update_appointment(
     appointment_id: int,
@@ -148,8 +390,8 @@ def update_appointment(
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
-    service = db.query(Service).filter(Service.name == appointment.type).first()
-    if not service:
+    owner_id = appointment.business_id
+    if owner_id is None:
         raise HTTPException(status_code=404, detail="Service not found")
     
     update_data = update.dict(exclude_unset=True)
@@ -163,14 +405,34 @@ def update_appointment(
         duration=appointment.duration,
         date=appointment.date.strftime("%Y-%m-%d"),
         db=db,
-        owner_id=service.owner_id,
+        owner_id=owner_id,
         exclude_id=appointment_id
     ):
         raise HTTPException(status_code=400, detail="Time slot conflict")
     
+    start_minutes = to_minutes(appointment.start_time)
+    end_minutes = start_minutes + appointment.duration
+    appointment_day = appointment.date.date()
     try:
+        lock_days(db, owner_id, [appointment_day])
+        if committed_conflict(
+            db, owner_id, [(appointment_day, start_minutes, appointment.duration)], exclude_id=appointment_id
+        ):
+            db.rollback()
+            conflict_index.invalidate(owner_id, appointment_day)
+            raise HTTPException(status_code=400, detail="Time slot conflict")
         db.commit()
+        conflict_index.discard(appointment_id)
+        conflict_index.add(
+            owner_id,
+            appointment_day,
+            start_minutes,
+            end_minutes,
+            appointment_id
+        )
         return {"message": "Appointment updated successfully", "appointment": appointment}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -188,6 +450,7 @@ def delete_appointment(
    try:
        db.delete(appointment)
        db.commit()
+       conflict_index.discard(appointment_id)
        return {"message": "Appointment deleted successfully"}
    except Exception as e:
        db.rollback()
@@ -197,7 +460,9 @@ def delete_appointment(
 @router.get("/available-topics")
 def get_available_topics(db: Session = Depends(get_db)):
     """Get all available topics that can be used for appointments"""
-    topics = db.query(Topic).join(Service).all()
+    topics = db.query(Topic).join(Topic.service).options(
+        contains_eager(Topic.service).joinedload(Service.owner)
+    ).all()
     
     topic_list = []
     for topic in topics:
@@ -211,39 +476,28 @@ def get_available_topics(db: Session = Depends(get_db)):
     
     return topic_list
 
-@router.get("/appointments/search-by-user", response_model=List[AppointmentResponse])
+@router.get("/appointments/search-by-user", response_model=Union[List[AppointmentResponse], Page[AppointmentResponse]])
 async def search_appointments_by_user(
-   db: Session = Depends(get_db),
-   current_user: dict = Depends(get_current_user)
+   page: PageParams = Depends(),
+   db: AsyncSession = Depends(get_async_db),
+   user: User = Depends(async_current_user_db)
 ):
-   user = db.query(User).filter(User.username == current_user["sub"]).first()
-   if not user:
-       raise HTTPException(status_code=404, detail="User not found")
+   appointments = (await db.scalars(CUSTOMER_APPOINTMENTS_ORDER.apply(
+       select(Appointment).where(Appointment.customer_phone.contains(user.phone)),
+       page
+   ))).all()
 
-   appointments = db.query(Appointment).filter(
-       Appointment.customer_phone.contains(user.phone)
-   ).order_by(Appointment.date.desc()).all()
-
-   if not appointments:
+   if not appointments and not page.cursor:
        raise HTTPException(status_code=404, detail="No appointments found")
 
-   return appointments
+   return page.wrap(*CUSTOMER_APPOINTMENTS_ORDER.split(appointments, page))
 
 
-@router.get("/me", response_model=UserResponse)
+@router.get("/me", response_model=UserResponse, dependencies=[Depends(use_primary)])
 async def get_current_user_info(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    user: User = Depends(async_current_user_db)
 ):
     """Get current user information"""
-    username = current_user.get("sub")
-    if not username:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     return UserResponse(
         id=user.id,
         first_name=user.first_name,
@@ -267,8 +521,107 @@ def delete_appointment(
     try:
         db.delete(appointment)
         db.commit()
+        conflict_index.discard(appointment_id)
         return {"message": "Appointment deleted successfully"}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    
\ No newline at end of file
+
+
+@router.get("/businesses/{business_id}/free-slots", response_model=FreeSlotsResponse)
+def get_free_slots(
+    business_id: int,
+    service: str,
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    step: int = Query(15, ge=1, le=240),
+    db: Session = Depends(get_db)
+):
+    """Get every bookable start time for a service in a date range"""
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (date_to - date_from).days + 1 > MAX_FREE_SLOT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range is limited to {MAX_FREE_SLOT_DAYS} days"
+        )
+
+    db_service = db.query(Service).filter(
+        Service.name == service,
+        Service.owner_id == business_id
+    ).first()
+
+    if not db_service:
+        available_services = db.query(Service).filter(
+            Service.owner_id == business_id
+        ).all()
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"Invalid service: '{service}'. Service must be one of the available services.",
+                "available_services": [s.name for s in available_services]
+            }
+        )
+
+    slots = find_free_slots(db, business_id, db_service.duration, date_from, date_to, step)
+
+    return {
+        "business_id": business_id,
+        "service": db_service.name,
+        "duration": db_service.duration,
+        "days": [
+            {"day": day, "start_times": start_times}
+            for day, start_times in sorted(slots.items())
+        ]
+    }
+
+
+@router.get("/earliest-slots", response_model=List[EarliestSlot])
+def get_earliest_slots(
+    service: str,
+    window_start: datetime = Query(..., alias="from"),
+    window_end: datetime = Query(..., alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    step: int = Query(15, ge=1, le=240),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the soonest bookable slots for any service matching a keyword, across
+    all businesses. Each matching service contributes a lazy, time-ordered
+    stream of free slots and a heap merge takes the first `limit` of them.
+    """
+    keyword = service.strip()
+    if not keyword:
+        raise HTTPException(status_code=400, detail="Service keyword is required")
+    window_start, window_end = to_local_naive(window_start), to_local_naive(window_end)
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if (window_end - window_start).days >= MAX_EARLIEST_SLOT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Search window is limited to {MAX_EARLIEST_SLOT_DAYS} days"
+        )
+
+    matches = db.query(Service, User).join(
+        User, Service.owner_id == User.id
+    ).filter(
+        User.role == "business_owner",
+        Service.name.icontains(keyword, autoescape=True)
+    ).all()
+
+    def stream(db_service, owner):
+        for start in iter_free_slots(db, owner.id, db_service.duration, window_start, window_end, step):
+            # (start, ids) are unique per stream, so the dict is never compared
+            yield start, owner.id, db_service.id, {
+                "business_id": owner.id,
+                "business_name": owner.business_name,
+                "service_id": db_service.id,
+                "service": db_service.name,
+                "duration": db_service.duration,
+                "price": db_service.price,
+                "start": start
+            }
+
+    streams = [stream(db_service, owner) for db_service, owner in matches]
+    return [slot for *_, slot in islice(merge(*streams), limit)]
+
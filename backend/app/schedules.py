@@ -0,0 +1,98 @@
+import os
+import threading
+import time as _time
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.conflicts import to_minutes
+from app.models import Availability
+
+# Seconds a compiled schedule is trusted before it is rebuilt from the database.
+# Writes in this process invalidate immediately; this bounds staleness across workers.
+SCHEDULE_CACHE_TTL = float(os.getenv("SCHEDULE_CACHE_TTL", "60"))
+
+MINUTES_PER_DAY = 1440
+WEEKDAYS = {name: i for i, name in enumerate(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+)}
+
+
+class WeeklySchedule:
+    """
+    A business's weekly availability compiled into one 1440-bit integer per
+    weekday (bit m set = minute m is open), indexed by date.weekday().
+    """
+
+    def __init__(self, availability: Iterable[Availability]):
+        masks = [0] * 7
+        for slot in availability:
+            start, end = to_minutes(slot.start_time), to_minutes(slot.end_time)
+            if end > start:
+                masks[WEEKDAYS[slot.day_of_week]] |= ((1 << (end - start)) - 1) << start
+        self.masks = tuple(masks)
+        self._array = None
+
+    def is_open_day(self, weekday: int) -> bool:
+        return self.masks[weekday] != 0
+
+    def covers(self, weekday: int, start: int, end: int) -> bool:
+        """True if every minute of [start, end) is within business hours"""
+        if start < 0 or end > MINUTES_PER_DAY or end <= start:
+            return False
+        span = ((1 << (end - start)) - 1) << start
+        return self.masks[weekday] & span == span
+
+    def as_array(self) -> np.ndarray:
+        """7 x 1440 boolean array of the same masks (read-only, shared)"""
+        if self._array is None:
+            packed = np.frombuffer(
+                b"".join(mask.to_bytes(MINUTES_PER_DAY // 8, "little") for mask in self.masks),
+                dtype=np.uint8
+            )
+            array = np.unpackbits(packed, bitorder="little").astype(bool).reshape(7, MINUTES_PER_DAY)
+            array.flags.writeable = False
+            self._array = array
+        return self._array
+
+
+class ScheduleCache:
+    """Process-wide cache of WeeklySchedule by owner_id"""
+
+    def __init__(self, ttl: float = SCHEDULE_CACHE_TTL):
+        self.ttl = ttl
+        self._schedules: Dict[int, Tuple[float, WeeklySchedule]] = {}
+        self._generation = 0  # bumped on every invalidation
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, owner_id: int) -> WeeklySchedule:
+        now = _time.monotonic()
+        with self._lock:
+            cached = self._schedules.get(owner_id)
+            if cached and now - cached[0] < self.ttl:
+                return cached[1]
+            generation = self._generation
+
+        schedule = WeeklySchedule(
+            db.query(Availability).filter(Availability.owner_id == owner_id).all()
+        )
+        with self._lock:
+            # don't cache a schedule read before a concurrent invalidation, or
+            # one read from a replica that may not have that write yet
+            if generation == self._generation and not db.info.get("replica"):
+                self._schedules[owner_id] = (now, schedule)
+        return schedule
+
+    def invalidate(self, owner_id: int):
+        with self._lock:
+            self._generation += 1
+            self._schedules.pop(owner_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._schedules.clear()
+
+
+schedule_cache = ScheduleCache()
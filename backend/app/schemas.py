@@ -1,5 +1,5 @@
-from datetime import datetime, time
-from typing import List, Optional
+from datetime import datetime, time, date
+from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel, ConfigDict, validator , Field
 from enum import Enum
 
@@ -95,6 +95,39 @@ class AppointmentCreate(BaseModel):
     customer_name: str
     customer_phone: str
 
+class AppointmentBatchCreate(BaseModel):
+    appointments: List[AppointmentCreate] = Field(..., min_length=1, max_length=200)
+
+MAX_SERIES_OCCURRENCES = 104
+
+class RecurrenceFrequency(str, Enum):
+    WEEKLY = "weekly"
+    BIWEEKLY = "biweekly"
+    EVERY_N_DAYS = "every_n_days"
+
+class AppointmentSeriesCreate(BaseModel):
+    date: datetime  # first occurrence
+    start_time: time
+    title: str
+    customer_name: str
+    customer_phone: str
+    frequency: RecurrenceFrequency
+    interval_days: Optional[int] = Field(None, ge=1, le=365)  # required for every_n_days
+    until: Optional[datetime] = None  # last day an occurrence may fall on
+    count: Optional[int] = Field(None, ge=1, le=MAX_SERIES_OCCURRENCES)
+
+    @validator('interval_days', always=True)
+    def interval_required_for_every_n_days(cls, v, values):
+        if values.get('frequency') == RecurrenceFrequency.EVERY_N_DAYS and v is None:
+            raise ValueError('interval_days is required for every_n_days')
+        return v
+
+    @validator('count', always=True)
+    def until_or_count(cls, v, values):
+        if (v is None) == (values.get('until') is None):
+            raise ValueError('exactly one of until or count is required')
+        return v
+
 class AppointmentUpdate(BaseModel):
     date: Optional[datetime] = None
     start_time: Optional[time] = None
@@ -106,6 +139,34 @@ class AppointmentUpdate(BaseModel):
 class AppointmentResponse(AppointmentBase):
     id: int
 
+class EarliestSlot(BaseModel):
+    business_id: int
+    business_name: Optional[str]
+    service_id: int
+    service: str
+    duration: int
+    price: int
+    start: datetime
+
+class DayFreeSlots(BaseModel):
+    day: date
+    start_times: List[str]  # Format as HH:MM
+
+class FreeSlotsResponse(BaseModel):
+    business_id: int
+    service: str
+    duration: int
+    days: List[DayFreeSlots]
+
+class UtilizationResponse(BaseModel):
+    business_id: int
+    date_from: date
+    date_to: date
+    weekdays: List[str]
+    booked_minutes: List[List[int]]  # weekday x hour
+    available_minutes: List[List[int]]
+    utilization: List[List[Optional[float]]]  # None where the business is closed
+
 class BusinessResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -174,4 +235,30 @@ class MessageResponse(BaseModel):
     created_at: datetime
     read: bool
     sender_name: str 
-    recipient_name: str
\ No newline at end of file
+    recipient_name: str
+
+MAX_BULK_MESSAGES = 1000
+
+class MessageSelection(BaseModel):
+    """Messages a bulk action applies to: listed ids and/or a filter, always within the caller's inbox"""
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=MAX_BULK_MESSAGES)
+    sender_id: Optional[int] = None
+    title: Optional[MessageTitle] = None
+    read: Optional[bool] = None
+    before: Optional[datetime] = None  # sent before this moment; use now to select the whole inbox
+
+    @validator('before', always=True)
+    def something_selected(cls, v, values):
+        if v is None and all(values.get(f) is None for f in ('ids', 'sender_id', 'title', 'read')):
+            raise ValueError('give ids or at least one filter')
+        return v
+
+class BulkResult(BaseModel):
+    count: int  # messages the action changed
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated list; pass next_cursor back as ?cursor= for the next"""
+    items: List[T]
+    next_cursor: Optional[str] = None
@@ -1,7 +1,10 @@
 from passlib.context import CryptContext
 import jwt
 from datetime import datetime, timedelta
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -9,13 +12,34 @@ SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key_for_development")
 
 ALGORITHM = "HS256"  
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor for new hashes; hashes with any other cost are rehashed at login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Most bcrypt computations running at once in this process; the rest queue up
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so these threads hash in parallel without holding
+# up the event loop or the request threadpool
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="password-hash")
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return _hash_pool.submit(pwd_context.hash, password).result()
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _hash_pool.submit(pwd_context.verify, plain_password, hashed_password).result()
+
+async def verify_and_update_password(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password without blocking the event loop. Returns (valid, new_hash);
+    new_hash is set when the stored hash uses outdated parameters. With no stored
+    hash a dummy check still runs, so unknown usernames take as long as known ones.
+    """
+    loop = asyncio.get_running_loop()
+    if hashed_password is None:
+        await loop.run_in_executor(_hash_pool, pwd_context.dummy_verify)
+        return False, None
+    return await loop.run_in_executor(_hash_pool, pwd_context.verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
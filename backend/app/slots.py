@@ -0,0 +1,286 @@
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.conflicts import day_bounds, to_minutes
+from app.models import Appointment
+from app.schedules import schedule_cache, MINUTES_PER_DAY
+from app.utils import NO_AVAILABILITY, OUTSIDE_HOURS, APPOINTMENT_CONFLICT
+
+# Reason for bookings in one batch that overlap each other
+BATCH_CONFLICT = "batch_conflict"
+
+# Date ranges OR-ed into one appointments query before starting another
+RANGES_PER_QUERY = 50
+
+def bookable_starts(free: np.ndarray, duration: int) -> np.ndarray:
+    """
+    For a (days x 1440) free-minute mask, return a same-shaped mask that is True
+    at every minute where a `duration`-minute appointment fits entirely in free time.
+    """
+    result = np.zeros_like(free)
+    if duration <= 0 or duration > MINUTES_PER_DAY:
+        return result
+    blocked = _prefix_counts(~free)
+    last_start = MINUTES_PER_DAY - duration + 1
+    result[:, :last_start] = (blocked[:, duration:] - blocked[:, :last_start]) == 0
+    return result
+
+
+def owner_appointments_query(db: Session, owner_id: int, date_from: date_type, date_to: date_type):
+    """(date, start_time, duration) of an owner's appointments in [date_from, date_to]"""
+    range_start, _ = day_bounds(date_from)
+    _, range_end = day_bounds(date_to)
+    return db.query(
+        Appointment.date, Appointment.start_time, Appointment.duration
+    ).filter(
+        Appointment.business_id == owner_id,
+        Appointment.date >= range_start,
+        Appointment.date < range_end
+    )
+
+
+def owner_appointments(db: Session, owner_id: int, date_from: date_type, date_to: date_type):
+    return owner_appointments_query(db, owner_id, date_from, date_to).all()
+
+
+def day_runs(days: List[date_type]) -> List[Tuple[date_type, date_type]]:
+    """Sorted distinct days collapsed into (first, last) runs of consecutive days"""
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def owner_runs_query(db: Session, owner_id: int, runs: List[Tuple[date_type, date_type]]):
+    """(date, start_time, duration) of an owner's appointments within any of the (first, last) day runs"""
+    return db.query(
+        Appointment.date, Appointment.start_time, Appointment.duration
+    ).filter(
+        Appointment.business_id == owner_id,
+        or_(*(
+            and_(Appointment.date >= day_bounds(first)[0], Appointment.date < day_bounds(last)[1])
+            for first, last in runs
+        ))
+    )
+
+
+def owner_appointments_on_days(db: Session, owner_id: int, days: List[date_type]):
+    """
+    Appointments of an owner on the given sorted days only, so a series or
+    batch with scattered dates doesn't read every booking in between
+    """
+    runs = day_runs(days)
+    appointments = []
+    for i in range(0, len(runs), RANGES_PER_QUERY):
+        appointments += owner_runs_query(db, owner_id, runs[i:i + RANGES_PER_QUERY]).all()
+    return appointments
+
+
+def busy_minutes(appointments, days: List[date_type]) -> np.ndarray:
+    """(len(days) x 1440) mask of minutes taken by the given appointments"""
+    rows = {day: i for i, day in enumerate(days)}
+    busy = np.zeros((len(days), MINUTES_PER_DAY), dtype=bool)
+    for apt_date, start_time, duration in appointments:
+        row = rows.get(apt_date.date() if isinstance(apt_date, datetime) else apt_date)
+        if row is None:
+            continue
+        start = to_minutes(start_time)
+        busy[row, start:start + duration] = True
+    return busy
+
+
+def free_minutes(weekly_mask: np.ndarray, appointments, days: List[date_type]) -> np.ndarray:
+    """(len(days) x 1440) mask of minutes that are open and not taken by an appointment"""
+    weekdays = [day.weekday() for day in days]
+    return weekly_mask[weekdays] & ~busy_minutes(appointments, days)
+
+
+def _prefix_counts(mask: np.ndarray) -> np.ndarray:
+    """counts[:, m] = number of True minutes before minute m, per row"""
+    counts = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(mask, axis=1, out=counts[:, 1:])
+    return counts
+
+
+def overlapping_in_batch(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    True for every interval that overlaps another interval on the same row.
+    Sorting by (row, start) means an interval overlaps an earlier one iff its start
+    is below the running max end of its row, and a later one iff the next start is
+    below its own end.
+    """
+    result = np.zeros(len(rows), dtype=bool)
+    if len(rows) < 2:
+        return result
+    order = np.lexsort((starts, rows))
+    r, s, e = rows[order], starts[order], ends[order]
+    same_row = r[1:] == r[:-1]
+
+    # rows are ascending, so offsetting by row keeps the running max per row
+    stride = 2 * MINUTES_PER_DAY + 1
+    running_end = np.maximum.accumulate(r * stride + e) - r * stride
+    hits_previous = np.zeros(len(r), dtype=bool)
+    hits_previous[1:] = same_row & (s[1:] < running_end[:-1])
+    hits_next = np.zeros(len(r), dtype=bool)
+    hits_next[:-1] = same_row & (s[1:] < e[:-1])
+
+    result[order] = hits_previous | hits_next
+    return result
+
+
+def check_bookings(
+    db: Session,
+    owner_id: int,
+    bookings: List[Tuple[date_type, int, int]]
+) -> List[Optional[str]]:
+    """
+    Validate many (day, start_minute, duration) bookings of one owner at once.
+    Returns a reason per booking, using the same codes as utils.check_time_slot
+    plus BATCH_CONFLICT for bookings that overlap each other.
+    """
+    if not bookings:
+        return []
+    days = sorted({day for day, _, _ in bookings})
+    row_of = {day: i for i, day in enumerate(days)}
+
+    open_mask = schedule_cache.get(db, owner_id).as_array()[[day.weekday() for day in days]]
+    busy = busy_minutes(owner_appointments_on_days(db, owner_id, days), days)
+    closed_before = _prefix_counts(~open_mask)
+    busy_before = _prefix_counts(busy)
+
+    rows = np.array([row_of[day] for day, _, _ in bookings])
+    starts = np.array([start for _, start, _ in bookings])
+    ends = starts + np.array([duration for _, _, duration in bookings])
+    clipped = np.minimum(ends, MINUTES_PER_DAY)
+
+    no_availability = ~open_mask.any(axis=1)[rows]
+    outside_hours = (ends > MINUTES_PER_DAY) | (closed_before[rows, clipped] > closed_before[rows, starts])
+    conflict = busy_before[rows, clipped] > busy_before[rows, starts]
+    candidate = ~(no_availability | outside_hours | conflict)
+    batch_conflict = np.zeros(len(bookings), dtype=bool)
+    batch_conflict[candidate] = overlapping_in_batch(rows[candidate], starts[candidate], ends[candidate])
+
+    reasons = []
+    for i in range(len(bookings)):
+        if no_availability[i]:
+            reasons.append(NO_AVAILABILITY)
+        elif outside_hours[i]:
+            reasons.append(OUTSIDE_HOURS)
+        elif conflict[i]:
+            reasons.append(APPOINTMENT_CONFLICT)
+        elif batch_conflict[i]:
+            reasons.append(BATCH_CONFLICT)
+        else:
+            reasons.append(None)
+    return reasons
+
+
+def find_free_slots(
+    db: Session,
+    owner_id: int,
+    duration: int,
+    date_from: date_type,
+    date_to: date_type,
+    step: int = 15
+) -> Dict[date_type, List[str]]:
+    """
+    All start times (every `step` minutes) in [date_from, date_to] at which a
+    `duration`-minute appointment fits inside business hours without overlapping
+    any of the owner's existing appointments.
+    """
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    weekly_mask = schedule_cache.get(db, owner_id).as_array()
+    appointments = owner_appointments(db, owner_id, date_from, date_to)
+
+    starts = bookable_starts(free_minutes(weekly_mask, appointments, days), duration)
+    starts[:, np.arange(MINUTES_PER_DAY) % step != 0] = False
+
+    slots = {}
+    for day_index, minute in zip(*np.nonzero(starts)):
+        slots.setdefault(days[day_index], []).append(f"{minute // 60:02d}:{minute % 60:02d}")
+    return slots
+
+
+def iter_free_slots(
+    db: Session,
+    owner_id: int,
+    duration: int,
+    window_start: datetime,
+    window_end: datetime,
+    step: int = 15,
+    chunk_days: int = 7
+) -> Iterator[datetime]:
+    """
+    Lazily yield, in time order, every start (every `step` minutes) at which a
+    `duration`-minute appointment fits between window_start and window_end.
+    Appointments are loaded `chunk_days` at a time, and only once the caller
+    has consumed the previous chunk, so a consumer that stops early never
+    touches the rest of the calendar.
+    """
+    schedule = schedule_cache.get(db, owner_id)
+    if not any(schedule.is_open_day(weekday) for weekday in range(7)):
+        return
+    weekly_mask = schedule.as_array()
+    off_step = np.arange(MINUTES_PER_DAY) % step != 0
+    slot_length = timedelta(minutes=duration)
+
+    day, last_day = window_start.date(), window_end.date()
+    while day <= last_day:
+        chunk = [day + timedelta(days=i) for i in range(min(chunk_days, (last_day - day).days + 1))]
+        day = chunk[-1] + timedelta(days=1)
+        open_days = [d for d in chunk if schedule.is_open_day(d.weekday())]
+        if not open_days:
+            continue
+
+        appointments = owner_appointments(db, owner_id, open_days[0], open_days[-1])
+        starts = bookable_starts(free_minutes(weekly_mask, appointments, open_days), duration)
+        starts[:, off_step] = False
+        # nonzero walks row-major, i.e. day by day, minute by minute
+        for row, minute in zip(*np.nonzero(starts)):
+            slot = datetime.combine(open_days[row], datetime.min.time()) + timedelta(minutes=int(minute))
+            if slot < window_start:
+                continue
+            if slot + slot_length > window_end:
+                return
+            yield slot
+
+
+def weekly_utilization(
+    db: Session,
+    owner_id: int,
+    date_from: date_type,
+    date_to: date_type
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Booked and available minutes of an owner in [date_from, date_to], each as a
+    7 x 24 (weekday x hour) matrix. Only booked minutes inside business hours
+    count, so booked <= available wherever appointments don't overlap.
+    """
+    weekly_mask = schedule_cache.get(db, owner_id).as_array()
+    days = (date_to - date_from).days + 1
+    occurrences = np.bincount((date_from.weekday() + np.arange(days)) % 7, minlength=7)
+    available = weekly_mask * occurrences[:, None]
+
+    appointments = owner_appointments(db, owner_id, date_from, date_to)
+    booked = np.zeros((7, MINUTES_PER_DAY), dtype=np.int64)
+    if appointments:
+        weekdays = np.array([apt_date.weekday() for apt_date, _, _ in appointments])
+        starts = np.array([to_minutes(start_time) for _, start_time, _ in appointments])
+        ends = np.minimum(starts + np.array([duration for _, _, duration in appointments]), MINUTES_PER_DAY)
+        # +1 at each start and -1 at each end, summed along the day, gives the
+        # number of appointments covering every weekday-minute over the range
+        edges = np.zeros((7, MINUTES_PER_DAY + 1), dtype=np.int64)
+        np.add.at(edges, (weekdays, starts), 1)
+        np.add.at(edges, (weekdays, ends), -1)
+        booked = np.cumsum(edges[:, :-1], axis=1) * weekly_mask
+
+    by_hour = (7, 24, 60)
+    return booked.reshape(by_hour).sum(axis=2), available.reshape(by_hour).sum(axis=2)
+
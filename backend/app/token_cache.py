@@ -0,0 +1,78 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Most decoded tokens kept per worker; 0 turns the cache off
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+
+
+class TokenCache:
+    """
+    LRU cache of verified JWT claims keyed by a SHA-256 digest of the token,
+    so a token's signature is checked once per worker and the raw token is
+    never kept. Entries are served only until the token's own `exp`.
+    """
+
+    def __init__(self, size: int = JWT_CACHE_SIZE):
+        self.size = size
+        self._claims: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            cached = self._claims.get(key)
+            if cached is None or cached[0] <= time.time():
+                if cached is not None:
+                    del self._claims[key]
+                self.misses += 1
+                return None
+            self._claims.move_to_end(key)
+            self.hits += 1
+        return dict(cached[1])
+
+    def put(self, token: str, claims: dict):
+        expires = claims.get("exp")
+        if self.size <= 0 or not isinstance(expires, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._claims[key] = (expires, dict(claims))
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.size:
+                self._claims.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def metrics(self) -> List[str]:
+        with self._lock:
+            size, hits, misses, evictions = len(self._claims), self.hits, self.misses, self.evictions
+        return [
+            "# HELP jwt_cache_hits_total Requests whose token claims came from the cache",
+            "# TYPE jwt_cache_hits_total counter",
+            f"jwt_cache_hits_total {hits}",
+            "# HELP jwt_cache_misses_total Requests whose token had to be verified",
+            "# TYPE jwt_cache_misses_total counter",
+            f"jwt_cache_misses_total {misses}",
+            "# HELP jwt_cache_evictions_total Cached tokens dropped to stay within JWT_CACHE_SIZE",
+            "# TYPE jwt_cache_evictions_total counter",
+            f"jwt_cache_evictions_total {evictions}",
+            "# HELP jwt_cache_entries Tokens currently cached",
+            "# TYPE jwt_cache_entries gauge",
+            f"jwt_cache_entries {size}",
+        ]
+
+
+token_cache = TokenCache()
@@ -0,0 +1,52 @@
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Message, UnreadCounter
+
+
+def unread_delta(dialect: str, user_id: int, delta: int):
+    """
+    Statement adding `delta` to a user's unread counter as one atomic upsert,
+    so concurrent senders never lose an increment. A missing row starts from
+    zero; reconcile_unread_counters fills in the true count for old data.
+    """
+    dialect_insert = mysql.insert if dialect == "mysql" else sqlite.insert
+    statement = dialect_insert(UnreadCounter).values(user_id=user_id, unread=max(delta, 0))
+    if dialect == "mysql":
+        return statement.on_duplicate_key_update(unread=UnreadCounter.unread + delta)
+    return statement.on_conflict_do_update(
+        index_elements=[UnreadCounter.user_id],
+        set_={"unread": UnreadCounter.unread + delta}
+    )
+
+
+async def adjust_unread(db: AsyncSession, user_id: int, delta: int):
+    """Add `delta` to a user's unread counter in the session's transaction"""
+    await db.execute(unread_delta(db.get_bind().dialect.name, user_id, delta))
+
+
+def reconcile_unread_counters(db: Session) -> int:
+    """
+    Recompute every unread counter from messages with two set-based
+    statements, creating counters for recipients that have none.
+    Returns the number of counters that were wrong.
+    """
+    actual = select(func.count()).select_from(Message).where(
+        Message.recipient_id == UnreadCounter.user_id,
+        Message.read == False
+    ).scalar_subquery()
+    fixed = db.execute(
+        update(UnreadCounter).where(UnreadCounter.unread != actual).values(unread=actual)
+    ).rowcount
+
+    missing = select(Message.recipient_id, func.count()).where(
+        Message.read == False,
+        ~exists().where(UnreadCounter.user_id == Message.recipient_id)
+    ).group_by(Message.recipient_id)
+    fixed += db.execute(
+        UnreadCounter.__table__.insert().from_select(["user_id", "unread"], missing)
+    ).rowcount
+    db.commit()
+    return fixed
@@ -0,0 +1,116 @@
+import os
+import threading
+import time as _time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models import User
+
+# Seconds a cached user record is trusted; bounds staleness across workers
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# Most user records kept; the least recently used are dropped first
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+_COLUMNS = tuple(column.key for column in User.__mapper__.column_attrs)
+
+
+class UserCache:
+    """
+    Process-wide TTL/LRU cache of user rows by id.
+
+    Only column values are kept, never ORM instances; a hit is turned into a
+    User attached to the caller's session without running a query, so its
+    relationships still lazy-load there as usual.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._users: "OrderedDict[int, Tuple[float, dict]]" = OrderedDict()
+        self._generation = 0  # bumped on every invalidation
+        self._lock = threading.Lock()
+
+    def _lookup(self, user_id: int) -> Tuple[Optional[dict], int]:
+        now = _time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached and now - cached[0] < self.ttl:
+                self._users.move_to_end(user_id)
+                return cached[1], self._generation
+            return None, self._generation
+
+    def _store(self, db, generation: int, user: User):
+        values = {key: getattr(user, key) for key in _COLUMNS}
+        with self._lock:
+            # same rules as the schedule cache: nothing read before a concurrent
+            # invalidation, nothing read from a replica that may lag behind it
+            if generation != self._generation or db.info.get("replica"):
+                return
+            self._users[user.id] = (_time.monotonic(), values)
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.size:
+                self._users.popitem(last=False)
+
+    @staticmethod
+    def _detached(values: dict) -> User:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def get(self, db: Session, user_id: int) -> Optional[User]:
+        values, generation = self._lookup(user_id)
+        if values is not None:
+            return db.merge(self._detached(values), load=False)
+        user = db.get(User, user_id)
+        if user is not None:
+            self._store(db, generation, user)
+        return user
+
+    async def get_async(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        values, generation = self._lookup(user_id)
+        if values is not None:
+            return await db.merge(self._detached(values), load=False)
+        user = await db.get(User, user_id)
+        if user is not None:
+            self._store(db, generation, user)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generation += 1
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+# Any ORM update or delete of a User invalidates its cache entry: once at
+# flush, so readers racing the transaction don't cache the old row, and again
+# after commit, in case one of them read it in between.
+@event.listens_for(Session, "after_flush")
+def _user_changes_flushed(session, flush_context):
+    changed = {obj.id for obj in session.dirty | session.deleted if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+        for user_id in changed:
+            user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _user_changes_committed(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _user_changes_rolled_back(session):
+    session.info.pop("changed_users", None)
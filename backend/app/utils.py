@@ -1,10 +1,63 @@
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 import re
+import pytz
 from sqlalchemy.orm import Session
-from app.models import Appointment, Availability
 from typing import Optional
-from sqlalchemy import and_, extract, text
+from app.conflicts import conflict_index, to_minutes
+from app.schedules import schedule_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reasons returned by check_time_slot
+NO_AVAILABILITY = "no_availability"
+OUTSIDE_HOURS = "outside_hours"
+APPOINTMENT_CONFLICT = "appointment_conflict"
+
+# Appointments are stored as naive times in the business's local time
+LOCAL_TZ = pytz.timezone('Asia/Jerusalem')
+
+def to_local_naive(value: datetime) -> datetime:
+    """A timezone-aware datetime as naive local time, comparable with stored appointments"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(LOCAL_TZ).replace(tzinfo=None)
+
+def check_time_slot(
+    start_time: str,
+    duration: int,
+    date: str,
+    db: Session,
+    owner_id: int,
+    exclude_id: Optional[int] = None
+) -> Optional[str]:
+    """
+    Check a requested slot against the business hours and the owner's existing appointments.
+    Returns None if the slot is bookable, otherwise one of the reason constants above.
+    """
+    check_date = datetime.strptime(date, "%Y-%m-%d")
+    weekday = check_date.weekday()
+
+    schedule = schedule_cache.get(db, owner_id)
+    if not schedule.is_open_day(weekday):
+        return NO_AVAILABILITY
+
+    new_time = datetime.strptime(start_time, "%H:%M")
+    new_start = to_minutes(new_time)
+    new_end = new_start + duration
+
+    # Check if appointment fits within business hours
+    if not schedule.covers(weekday, new_start, new_end):
+        return OUTSIDE_HOURS
+
+    # Check for conflicts with the owner's appointments on that day
+    if conflict_index.find_overlap(
+        db, owner_id, check_date.date(), new_start, new_end, exclude_id
+    ) is not None:
+        return APPOINTMENT_CONFLICT
+
+    return None
 
 def is_time_conflict(
     start_time: str,
@@ -19,75 +72,21 @@ def is_time_conflict(
     Returns True if there is a conflict or not available, False if the time slot is available.
     """
     try:
-        print("\n=== TIME CONFLICT CHECK ===")
-        
-        check_date = datetime.strptime(date, "%Y-%m-%d")
-        day_of_week = check_date.strftime("%A")
-        print(f"Checking conflicts for date: {check_date.date()} ({day_of_week})")
-
-        availability = db.query(Availability).filter(
-            and_(
-                Availability.owner_id == owner_id,
-                Availability.day_of_week == day_of_week
-            )
-        ).all()
-
-        if not availability:
-            print(f"No business availability set for {day_of_week}")
-            return True
-
-        new_time = datetime.strptime(start_time, "%H:%M")
-        new_start = datetime.combine(check_date.date(), new_time.time())
-        new_end = new_start + timedelta(minutes=duration)
-
-        print(f"\nNew appointment window:")
-        print(f"Start: {new_start.strftime('%H:%M')}")
-        print(f"End: {new_end.strftime('%H:%M')}")
-
-        # Check if appointment fits within business hours
-        is_within_hours = False
-        for slot in availability:
-            slot_start = datetime.combine(check_date.date(), slot.start_time)
-            slot_end = datetime.combine(check_date.date(), slot.end_time)
-
-            if slot_start <= new_start and new_end <= slot_end:
-                is_within_hours = True
-                break
-
-        if not is_within_hours:
-            print("Appointment is outside business hours")
-            return True
-
-        # Check for conflicts with existing appointments
-        existing_appointments = db.query(Appointment).filter(
-            text("DATE(date) = DATE(:check_date)")
-        ).params(check_date=check_date).all()
-
-        print(f"\nFound {len(existing_appointments)} existing appointments")
-        for apt in existing_appointments:
-            if exclude_id and apt.id == exclude_id:
-                continue
-
-            # Convert existing appointment to datetime
-            existing_start = datetime.combine(check_date.date(), apt.start_time)
-            existing_end = existing_start + timedelta(minutes=apt.duration)
-
-            print(f"Checking appointment {apt.id}:")
-            print(f"Start: {existing_start.strftime('%H:%M')}")
-            print(f"End: {existing_end.strftime('%H:%M')}")
-
-            # Check for overlap using datetime comparison
-            if (new_start < existing_end and new_end > existing_start):
-                print(f"CONFLICT DETECTED: Overlaps with appointment {apt.id}")
-                return True
-
-        print("No conflicts found")
-        return False
-
-    except Exception as e:
-        print(f"Error in conflict checking: {str(e)}")
+        return check_time_slot(start_time, duration, date, db, owner_id, exclude_id) is not None
+    except Exception:
+        logger.exception("Error in conflict checking")
         return True
 
+def recurrence_dates(first_day, interval_days: int, until=None, count: Optional[int] = None, limit: int = 104):
+    """
+    Dates of a recurring series starting on first_day, every interval_days days,
+    either `count` times or up to and including `until`. Stops after `limit` + 1
+    dates so callers can detect an over-long series.
+    """
+    total = count if count is not None else (until - first_day).days // interval_days + 1
+    total = max(0, min(total, limit + 1))
+    return [first_day + timedelta(days=interval_days * i) for i in range(total)]
+
 def normalize_phone(phone: str) -> str:
 
     return re.sub(r'\D', '', phone)
@@ -0,0 +1,160 @@
+"""
+Async route load test.
+
+Serves the app from a single in-process uvicorn worker and hammers the unread
+message counter two ways: through a copy of the old handler (`async def` with
+the sync Session, so every query runs on the event loop) and through the real
+AsyncSession route. Each SQL statement is delayed by LATENCY_MS in whichever
+thread executes it, standing in for the network round trip to MySQL.
+
+Concurrency stays below the sync pool size (5 + 10 overflow): past that the old
+handler deadlocks, as it blocks the loop waiting for a connection that only the
+loop-scheduled teardown of another request would give back.
+
+    cd backend && python -m benchmarks.bench_async_routes
+"""
+import asyncio
+import os
+import threading
+import time
+
+os.environ.setdefault("TESTING", "True")
+
+import httpx
+import uvicorn
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_async_db, get_current_user
+from app.models import Message, User
+from app.security import create_access_token
+from app.unread import reconcile_unread_counters
+
+DATABASE_PATH = "./bench_async_routes.db"
+LATENCY_MS = float(os.getenv("LATENCY_MS", "2"))
+PORT = 8765
+REQUESTS = 400
+CONCURRENCY = 12
+
+engine = create_engine(f"sqlite:///{DATABASE_PATH}", connect_args={"check_same_thread": False})
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}")
+BenchSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+BenchAsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def add_latency(sqlite_connection):
+    # sqlite calls the trace callback from the thread running the statement
+    sqlite_connection.set_trace_callback(lambda statement: time.sleep(LATENCY_MS / 1000))
+
+
+@event.listens_for(engine, "connect")
+def delay_sync(dbapi_connection, connection_record):
+    add_latency(dbapi_connection)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def delay_async(dbapi_connection, connection_record):
+    add_latency(dbapi_connection.driver_connection._conn)
+
+
+def override_get_db():
+    db = BenchSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with BenchAsyncSession() as db:
+        yield db
+
+
+@app.get("/bench/unread-count-sync")
+async def unread_count_sync(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    """The handler as it was before the async session: blocking queries inside async def"""
+    user = db.query(User).filter(User.username == current_user["sub"]).first()
+    count = db.query(Message).filter(Message.recipient_id == user.id, Message.read == False).count()
+    return {"unread_count": count}
+
+
+def populate():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = BenchSession()
+    try:
+        owner = User(first_name="Owner", last_name="Bench", username="owner", phone="0500000001",
+                     password_hash="x", role="business_owner", business_name="Bench")
+        customer = User(first_name="Customer", last_name="Bench", username="customer", phone="0500000002",
+                        password_hash="x", role="customer")
+        db.add_all([owner, customer])
+        db.flush()
+        db.add_all([
+            Message(sender_id=customer.id, recipient_id=owner.id, title="Other Inquiries",
+                    content=f"Message {i}", read=i % 2 == 0)
+            for i in range(200)
+        ])
+        db.commit()
+        reconcile_unread_counters(db)
+    finally:
+        db.close()
+    return create_access_token(data={"sub": "owner", "role": "business_owner"})
+
+
+async def load(url, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        while not queue.empty():
+            queue.get_nowait()
+            began = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - began)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60, trust_env=False) as client:
+        began = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - began
+    latencies.sort()
+    return REQUESTS / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    token = populate()
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, workers=1, log_level="warning"))
+    server_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=server_loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        print(f"{REQUESTS} requests, {CONCURRENCY} concurrent, {LATENCY_MS:g} ms per statement")
+        print(f"{'handler':>16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, url in [("sync session", "/bench/unread-count-sync"),
+                          ("async session", "/api/messages/unread-count")]:
+            rps, p50, p95 = asyncio.run(load(url, token))
+            print(f"{name:>16} {rps:>8.0f} {p50 * 1e3:>8.1f} {p95 * 1e3:>8.1f}")
+    finally:
+        # aiosqlite connections must be closed on the loop that opened them
+        asyncio.run_coroutine_threadsafe(async_engine.dispose(), server_loop).result()
+        server.should_exit = True
+        thread.join()
+        engine.dispose()
+        if os.path.exists(DATABASE_PATH):
+            os.remove(DATABASE_PATH)
+
+
+if __name__ == "__main__":
+    main()
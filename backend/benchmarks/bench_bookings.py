@@ -0,0 +1,122 @@
+"""
+Concurrent booking benchmark.
+
+Fires bursts of simultaneous POST /api/shared/appointments requests at a
+few contested start times, first for one business (every writer queues on
+the same booking_days lock) and then spread across several businesses
+(writers for different days and businesses don't wait for each other).
+Reports throughput, winners, and the lock and appointment rows written.
+
+    cd backend && python -m benchmarks.bench_bookings
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as time_of_day, timedelta
+
+os.environ.setdefault("TESTING", "True")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import Base, get_db
+from app.models import Appointment, Availability, BookingDay, Service, User
+from app.conflicts import conflict_index
+from app.schedules import schedule_cache
+
+DATABASE_PATH = "./bench_bookings.db"
+DAY = datetime(2030, 1, 7)  # a Monday
+STARTS = [f"{hour:02d}:{minute:02d}" for hour in range(10, 15) for minute in (0, 30)]
+ATTEMPTS_PER_START = 30
+WORKERS = 32
+
+engine = create_engine(
+    f"sqlite:///{DATABASE_PATH}",
+    connect_args={"check_same_thread": False, "timeout": 30},
+    pool_size=WORKERS
+)
+BenchSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = BenchSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def populate(businesses):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    conflict_index.clear()
+    schedule_cache.clear()
+    db = BenchSession()
+    try:
+        owners = [
+            User(first_name="Owner", last_name=str(i), username=f"owner{i}", phone=f"05{i:08d}",
+                 password_hash="x", role="business_owner", business_name=f"Business {i}")
+            for i in range(businesses)
+        ]
+        db.add_all(owners)
+        db.flush()
+        for owner in owners:
+            db.add(Service(name=f"Haircut {owner.id}", duration=30, price=80, owner_id=owner.id))
+            db.add(Availability(day_of_week="Monday", start_time=time_of_day(9), end_time=time_of_day(17),
+                                owner_id=owner.id))
+        db.commit()
+        return [owner.id for owner in owners]
+    finally:
+        db.close()
+
+
+def run(businesses):
+    owner_ids = populate(businesses)
+    client = TestClient(app)
+
+    def book(attempt):
+        start = STARTS[attempt % len(STARTS)]
+        owner_id = owner_ids[attempt % len(owner_ids)]
+        response = client.post(
+            f"/api/shared/appointments?business_id={owner_id}",
+            json={
+                "date": DAY.strftime(f"%Y-%m-%dT{start}:00"),
+                "start_time": start,
+                "title": f"Haircut {owner_id}",
+                "customer_name": f"Customer {attempt}",
+                "customer_phone": f"050{attempt:07d}"
+            }
+        )
+        return response.status_code
+
+    total = len(STARTS) * ATTEMPTS_PER_START
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        statuses = list(pool.map(book, range(total)))
+    elapsed = time.perf_counter() - began
+
+    db = BenchSession()
+    try:
+        appointments, lock_rows = db.query(Appointment).count(), db.query(BookingDay).count()
+    finally:
+        db.close()
+    return total, elapsed, statuses.count(200), appointments, lock_rows
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app.dependency_overrides[get_db] = override_get_db
+    print(f"{'businesses':>10} {'requests':>9} {'req/s':>8} {'booked':>7} {'appointments':>13} {'lock rows':>10}")
+    for businesses in (1, 4, 16):
+        total, elapsed, booked, appointments, lock_rows = run(businesses)
+        print(f"{businesses:>10} {total:>9} {total / elapsed:>8.0f} {booked:>7} {appointments:>13} {lock_rows:>10}")
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    if os.path.exists(DATABASE_PATH):
+        os.remove(DATABASE_PATH)
+
+
+if __name__ == "__main__":
+    main()
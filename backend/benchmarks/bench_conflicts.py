@@ -0,0 +1,111 @@
+"""
+Conflict-check latency benchmark.
+
+Fills a scratch SQLite database with N businesses x M appointments per day and
+times check_time_slot() for a single business. Latency should stay flat as the
+platform grows, since only the checked business's day is ever loaded.
+
+    cd backend && python -m benchmarks.bench_conflicts
+"""
+import os
+import time
+from datetime import datetime, time as time_of_day, timedelta
+
+os.environ.setdefault("TESTING", "True")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Appointment, Availability, Service, User
+from app.conflicts import conflict_index
+from app.schedules import schedule_cache
+from app.utils import check_time_slot
+
+DATABASE_URL = "sqlite:///./bench_conflicts.db"
+DAY = datetime(2030, 1, 7)  # a Monday
+CHECKS = 2000
+
+
+def populate(db, businesses, per_day):
+    owners = [
+        User(
+            first_name="Owner",
+            last_name=str(i),
+            username=f"owner{i}",
+            phone=f"05{i:08d}",
+            password_hash="x",
+            role="business_owner",
+            business_name=f"Business {i}"
+        )
+        for i in range(businesses)
+    ]
+    db.add_all(owners)
+    db.flush()
+
+    rows = []
+    for owner in owners:
+        service_name = f"Service {owner.id}"
+        db.add(Service(name=service_name, duration=10, price=50, owner_id=owner.id))
+        db.add(Availability(
+            day_of_week="Monday",
+            start_time=time_of_day(0, 0),
+            end_time=time_of_day(23, 59),
+            owner_id=owner.id
+        ))
+        for slot in range(per_day):
+            start = DAY + timedelta(minutes=slot * 1440 // per_day)
+            rows.append({
+                "business_id": owner.id,
+                "date": DAY,
+                "start_time": start.time(),
+                "duration": 1,
+                "title": service_name,
+                "customer_name": "Bench",
+                "customer_phone": "0500000000",
+                "type": service_name,
+                "cost": 50,
+            })
+    db.bulk_insert_mappings(Appointment, rows)
+    db.commit()
+    return owners[0].id
+
+
+def run(businesses, per_day):
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        owner_id = populate(db, businesses, per_day)
+        conflict_index.clear()
+        schedule_cache.clear()
+
+        # first check loads the day; the rest are served from the index
+        began = time.perf_counter()
+        check_time_slot("12:00", 1, DAY.strftime("%Y-%m-%d"), db, owner_id)
+        cold = time.perf_counter() - began
+
+        began = time.perf_counter()
+        for i in range(CHECKS):
+            minute = i % 1440
+            check_time_slot(f"{minute // 60:02d}:{minute % 60:02d}", 1, DAY.strftime("%Y-%m-%d"), db, owner_id)
+        warm = (time.perf_counter() - began) / CHECKS
+        return cold, warm
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+def main():
+    print(f"{'businesses':>10} {'appts/day':>10} {'cold ms':>10} {'warm us':>10}")
+    for businesses, per_day in [(10, 10), (100, 10), (1000, 10), (100, 100), (100, 1000)]:
+        cold, warm = run(businesses, per_day)
+        print(f"{businesses:>10} {per_day:>10} {cold * 1e3:>10.2f} {warm * 1e6:>10.1f}")
+    if os.path.exists("./bench_conflicts.db"):
+        os.remove("./bench_conflicts.db")
+
+
+if __name__ == "__main__":
+    main()
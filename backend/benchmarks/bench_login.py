@@ -0,0 +1,142 @@
+"""
+Login storm benchmark.
+
+Serves the app from a single in-process uvicorn worker and sends a burst of
+concurrent logins two ways: through a copy of the old handler (bcrypt verified
+on the event loop thread) and through the real /auth/login (bcrypt on the
+bounded password-hash pool). Meanwhile a probe requests GET / in a loop; its
+latency shows how long other requests are stalled behind the logins.
+
+    cd backend && python -m benchmarks.bench_login
+    BCRYPT_ROUNDS=10 PASSWORD_HASH_THREADS=8 python -m benchmarks.bench_login
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+os.environ.setdefault("TESTING", "True")
+
+import httpx
+import uvicorn
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import Base
+from app.dependencies import get_async_db
+from app.models import User
+from app.security import BCRYPT_ROUNDS, PASSWORD_HASH_THREADS, pwd_context, create_access_token
+
+DATABASE_PATH = "./bench_login.db"
+PORT = 8766
+USERS = 16
+REQUESTS = 64
+CONCURRENCY = 16
+
+engine = create_engine(f"sqlite:///{DATABASE_PATH}")
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}")
+BenchAsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def override_get_async_db():
+    async with BenchAsyncSession() as db:
+        yield db
+
+
+@app.post("/bench/login-blocking")
+async def login_blocking(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """The handler as it was: bcrypt runs on the event loop thread"""
+    db_user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not db_user or not pwd_context.verify(form_data.password, db_user.password_hash):
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    return {"access_token": create_access_token(data={"sub": db_user.username, "role": db_user.role})}
+
+
+def populate():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    password_hash = pwd_context.hash("benchpass")
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add_all([
+            User(first_name="User", last_name="Bench", username=f"user{i}", phone=f"05000000{i:02d}",
+                 password_hash=password_hash, role="customer")
+            for i in range(USERS)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def storm(url):
+    queue = asyncio.Queue()
+    for i in range(REQUESTS):
+        queue.put_nowait(f"user{i % USERS}")
+    done = asyncio.Event()
+    probes = []
+
+    async def worker(client):
+        while not queue.empty():
+            username = queue.get_nowait()
+            response = await client.post(url, data={"username": username, "password": "benchpass"})
+            response.raise_for_status()
+
+    async def probe(client):
+        while not done.is_set():
+            began = time.perf_counter()
+            (await client.get("/")).raise_for_status()
+            probes.append(time.perf_counter() - began)
+            await asyncio.sleep(0.01)
+
+    limits = httpx.Limits(max_connections=CONCURRENCY + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120, limits=limits,
+                                 trust_env=False) as client:
+        probing = asyncio.create_task(probe(client))
+        began = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - began
+        done.set()
+        await probing
+    return REQUESTS / elapsed, percentile(probes, 0.5), percentile(probes, 0.95), max(probes)
+
+
+def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    populate()
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, workers=1, log_level="warning"))
+    server_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=server_loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        print(f"{REQUESTS} logins, {CONCURRENCY} concurrent, bcrypt rounds {BCRYPT_ROUNDS}, "
+              f"{PASSWORD_HASH_THREADS} hash threads")
+        print(f"{'handler':>16} {'logins/s':>9} {'probe p50 ms':>13} {'probe p95 ms':>13} {'probe max ms':>13}")
+        for name, url in [("on event loop", "/bench/login-blocking"), ("hash pool", "/auth/login")]:
+            rps, p50, p95, worst = asyncio.run(storm(url))
+            print(f"{name:>16} {rps:>9.1f} {p50 * 1e3:>13.1f} {p95 * 1e3:>13.1f} {worst * 1e3:>13.1f}")
+    finally:
+        # aiosqlite connections must be closed on the loop that opened them
+        asyncio.run_coroutine_threadsafe(async_engine.dispose(), server_loop).result()
+        server.should_exit = True
+        thread.join()
+        engine.dispose()
+        if os.path.exists(DATABASE_PATH):
+            os.remove(DATABASE_PATH)
+
+
+if __name__ == "__main__":
+    main()
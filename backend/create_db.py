@@ -1,6 +1,102 @@
-from sqlalchemy import inspect, text
+from sqlalchemy import inspect, text, select, update
+from sqlalchemy.orm import Session
 from app.database import engine, Base
-from app.models import User, Appointment, Service, Topic, Availability, Message
+from app.models import User, Appointment, AppointmentSeries, BookingDay, Service, Topic, Availability, Message, MESSAGES_FTS_DDL
+from app.unread import reconcile_unread_counters
+
+BACKFILL_BATCH_SIZE = 500
+
+def add_appointment_columns():
+    """Add columns introduced after the appointments table was first created"""
+    columns = {column["name"] for column in inspect(engine).get_columns("appointments")}
+    is_mysql = engine.dialect.name == "mysql"
+
+    with engine.begin() as connection:
+        if "business_id" not in columns:
+            print("Adding appointments.business_id...")
+            connection.execute(text("ALTER TABLE appointments ADD COLUMN business_id INTEGER NULL"))
+            if is_mysql:
+                connection.execute(text(
+                    "ALTER TABLE appointments ADD CONSTRAINT fk_appointments_business "
+                    "FOREIGN KEY (business_id) REFERENCES users(id)"
+                ))
+        if "service_id" not in columns:
+            print("Adding appointments.service_id...")
+            connection.execute(text("ALTER TABLE appointments ADD COLUMN service_id INTEGER NULL"))
+            if is_mysql:
+                connection.execute(text(
+                    "ALTER TABLE appointments ADD CONSTRAINT fk_appointments_service "
+                    "FOREIGN KEY (service_id) REFERENCES services(id) ON DELETE SET NULL"
+                ))
+        if "series_id" not in columns:
+            print("Adding appointments.series_id...")
+            connection.execute(text("ALTER TABLE appointments ADD COLUMN series_id INTEGER NULL"))
+            if is_mysql:
+                connection.execute(text(
+                    "ALTER TABLE appointments ADD CONSTRAINT fk_appointments_series "
+                    "FOREIGN KEY (series_id) REFERENCES appointment_series(id)"
+                ))
+
+def add_missing_indexes():
+    """Create indexes added to existing tables after they were first created"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def add_message_search_table():
+    """SQLite only: create the messages_fts search table and triggers, indexing existing messages"""
+    if engine.dialect.name != "sqlite":
+        return  # MySQL's FULLTEXT index comes from add_missing_indexes
+    created = "messages_fts" not in inspect(engine).get_table_names()
+    with engine.begin() as connection:
+        for statement in MESSAGES_FTS_DDL:
+            connection.execute(text(statement))
+        if created:
+            print("Indexing existing messages for search...")
+            connection.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+
+def backfill_appointment_owners():
+    """Fill business_id/service_id from the service name, BACKFILL_BATCH_SIZE rows at a time"""
+    with Session(engine) as db:
+        services = {
+            name: (service_id, owner_id)
+            for service_id, name, owner_id in db.execute(
+                select(Service.id, Service.name, Service.owner_id)
+            )
+        }
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = db.execute(
+                select(Appointment.id, Appointment.type)
+                .where(Appointment.business_id.is_(None), Appointment.id > last_id)
+                .order_by(Appointment.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not batch:
+                break
+
+            rows = [
+                {"id": appointment_id, "service_id": services[type_][0], "business_id": services[type_][1]}
+                for appointment_id, type_ in batch
+                if type_ in services and services[type_][1] is not None
+            ]
+            if rows:
+                db.execute(update(Appointment), rows)
+            db.commit()
+            updated += len(rows)
+            last_id = batch[-1][0]
+
+        if updated:
+            print(f"Linked {updated} existing appointments to their business and service")
+
+def drop_appointment_slots():
+    """Drop the per-minute slot claims that the per-day booking lock replaced"""
+    if "appointment_slots" in inspect(engine).get_table_names():
+        print("Dropping appointment_slots (replaced by booking_days)...")
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE appointment_slots"))
 
 def init_db():
     inspector = inspect(engine)
@@ -28,5 +124,16 @@ def init_db():
         else:
             print("Warning: Messages table creation may have failed!")
 
+    add_appointment_columns()
+    add_missing_indexes()
+    add_message_search_table()
+    backfill_appointment_owners()
+    drop_appointment_slots()
+
+    with Session(engine) as db:
+        fixed = reconcile_unread_counters(db)
+    if fixed:
+        print(f"Reconciled {fixed} unread message counters")
+
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""
+Recompute every recipient's unread-message counter from the messages table.
+
+    cd backend && python reconcile_unread.py
+
+Safe to run at any time; create_db.py also runs it after migrating.
+"""
+from sqlalchemy.orm import Session
+from app.database import engine
+from app.unread import reconcile_unread_counters
+
+if __name__ == "__main__":
+    with Session(engine) as db:
+        fixed = reconcile_unread_counters(db)
+    print(f"Reconciled unread counters: {fixed} corrected")
@@ -0,0 +1,38 @@
+import pytest
+from app.conflicts import conflict_index
+from app.schedules import schedule_cache
+from app.user_cache import user_cache
+from app.token_cache import token_cache
+from app import query_stats
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    # Every test recreates the database, so nothing cached in-process may survive it
+    conflict_index.clear()
+    schedule_cache.clear()
+    user_cache.clear()
+    token_cache.clear()
+    yield
+    conflict_index.clear()
+    schedule_cache.clear()
+    user_cache.clear()
+    token_cache.clear()
+
+
+@pytest.fixture
+def max_statements(monkeypatch):
+    """
+    Check that a request ran at most `limit` SQL statements, to catch N+1
+    queries: max_statements(client.get("/api/..."), 3)
+    """
+    monkeypatch.setattr(query_stats, "QUERY_STATS_HEADERS", True)
+
+    def check(response, limit):
+        count = int(response.headers[query_stats.STATEMENTS_HEADER])
+        assert count <= limit, (
+            f"{response.request.method} {response.request.url.path} ran {count} SQL statements, "
+            f"expected at most {limit}"
+        )
+        return count
+    return check
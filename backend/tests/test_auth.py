@@ -1,12 +1,17 @@
+import threading
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db
+from app.dependencies import get_db, get_async_db
 from app.models import User
-from app.security import verify_password
+from passlib.context import CryptContext
+from app import security
+from app.security import verify_password, BCRYPT_ROUNDS
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -22,6 +27,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 @pytest.fixture(scope="function")
 def test_db():
     Base.metadata.create_all(bind=engine)
@@ -197,6 +211,37 @@ def test_login_invalid_username(client, test_customer):
     assert response.status_code == 401
     assert "Invalid username or password" in response.json()["detail"]
 
+def test_login_rehashes_outdated_hash(client, test_customer):
+    client.post("/auth/register", json=test_customer)
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.username == test_customer["username"]).first()
+    user.password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(test_customer["password"])
+    db.commit()
+    db.close()
+
+    response = client.post("/auth/login", data={"username": test_customer["username"], "password": test_customer["password"]})
+    assert response.status_code == 200
+
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.username == test_customer["username"]).first()
+    db.close()
+    assert user.password_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    assert verify_password(test_customer["password"], user.password_hash)
+
+def test_login_verifies_off_the_event_loop(client, test_customer, monkeypatch):
+    client.post("/auth/register", json=test_customer)
+    threads = []
+    verify_and_update = security.pwd_context.verify_and_update
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return verify_and_update(*args, **kwargs)
+
+    monkeypatch.setattr(security.pwd_context, "verify_and_update", record_thread)
+    response = client.post("/auth/login", data={"username": test_customer["username"], "password": test_customer["password"]})
+    assert response.status_code == 200
+    assert len(threads) == 1 and threads[0].startswith("password-hash")
+
 # Test role-based access (check if correct role is assigned)
 def test_register_correct_role(client, test_business_owner):
     response = client.post("/auth/register", json=test_business_owner)
@@ -1,11 +1,15 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from datetime import time
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db
+from app.dependencies import get_db, get_async_db
+from app.models import Availability
+from app.schedules import WeeklySchedule, schedule_cache
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -20,6 +24,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 @pytest.fixture(scope="function")
 def test_db():
     Base.metadata.create_all(bind=engine)
@@ -241,3 +254,34 @@ def test_delete_non_existent_availability(client, business_owner_token):
     )
     assert response.status_code == 404  # Availability not found
 
+
+def test_weekly_schedule_bitmask():
+    slots = [
+        Availability(day_of_week="Monday", start_time=time(9, 0), end_time=time(12, 0)),
+        Availability(day_of_week="Monday", start_time=time(13, 0), end_time=time(17, 0)),
+    ]
+    schedule = WeeklySchedule(slots)
+    assert schedule.is_open_day(0)
+    assert not schedule.is_open_day(1)
+    assert schedule.covers(0, 9 * 60, 12 * 60)
+    assert not schedule.covers(0, 11 * 60 + 30, 12 * 60 + 30)  # runs into the lunch break
+    assert not schedule.covers(0, 8 * 60 + 59, 9 * 60 + 30)
+    assert schedule.as_array()[0].sum() == 7 * 60
+
+def test_schedule_cache_invalidated_on_change(client, business_owner_token):
+    headers = {"Authorization": f"Bearer {business_owner_token}"}
+    db = TestingSessionLocal()
+    try:
+        assert not schedule_cache.get(db, 1).is_open_day(0)
+
+        response = client.post(
+            "/api/availability/availability",
+            headers=headers,
+            json={"day_of_week": "Monday", "start_time": "09:00", "end_time": "17:00"}
+        )
+        assert schedule_cache.get(db, 1).covers(0, 9 * 60, 17 * 60)
+
+        client.delete(f"/api/availability/availability/{response.json()['id']}", headers=headers)
+        assert not schedule_cache.get(db, 1).is_open_day(0)
+    finally:
+        db.close()
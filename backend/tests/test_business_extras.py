@@ -1,12 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.pool import NullPool
+from datetime import datetime, date, time, timedelta
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db
-from app.models import Appointment, User
+from app.dependencies import get_db, get_async_db
+from app.models import Appointment, Availability, User
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -21,6 +23,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 @pytest.fixture
 def test_db():
     Base.metadata.create_all(bind=engine)
@@ -61,6 +72,7 @@ def business_owner_token(client):
 def create_test_appointment(test_db):
     db = TestingSessionLocal()
     appointment = Appointment(
+        business_id=1,
         date=datetime.now().date(),
         start_time=datetime.strptime("10:00", "%H:%M").time(),
         duration=60,
@@ -146,3 +158,96 @@ def test_appointment_details_wrong_business(client, business_owner_token, create
     assert "permission" in response.json()["detail"].lower()
 
 
+
+def test_list_appointments_only_own_business(client, business_owner_token, create_test_appointment):
+    """Test appointments of other businesses are not listed"""
+    db = TestingSessionLocal()
+    db.add(Appointment(
+        business_id=2,
+        date=datetime.now().date(),
+        start_time=datetime.strptime("12:00", "%H:%M").time(),
+        duration=30,
+        title="Other Service",
+        customer_name="Someone Else",
+        customer_phone="0500000000",
+        type="Other Type",
+        cost=50
+    ))
+    db.commit()
+    db.close()
+
+    response = client.get(
+        "/api/business/appointments?business_id=1",
+        headers={"Authorization": f"Bearer {business_owner_token}"}
+    )
+    assert response.status_code == 200
+    assert [appointment["title"] for appointment in response.json()] == ["Test Service"]
+
+def add_monday_hours(db):
+    db.add(Availability(day_of_week="Monday", start_time=time(9, 0), end_time=time(11, 0), owner_id=1))
+    db.commit()
+
+def booking(day, start, duration):
+    return {
+        "business_id": 1,
+        "date": datetime.combine(day, time()),
+        "start_time": start,
+        "duration": duration,
+        "title": "Test Service",
+        "customer_name": "John Doe",
+        "customer_phone": "1234567890",
+        "type": "Test Type",
+        "cost": 100
+    }
+
+def test_appointments_utilization(client, business_owner_token):
+    """Test booked minutes are aggregated per weekday and hour against availability"""
+    db = TestingSessionLocal()
+    add_monday_hours(db)
+    db.bulk_insert_mappings(Appointment, [
+        booking(date(2030, 1, 7), time(9, 0), 30),
+        booking(date(2030, 1, 14), time(10, 30), 60),  # runs 30 minutes past closing
+    ])
+    db.commit()
+    db.close()
+
+    response = client.get(
+        "/api/business/appointments/utilization?from=2030-01-07&to=2030-01-20",
+        headers={"Authorization": f"Bearer {business_owner_token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    monday = data["weekdays"].index("Monday")
+    assert data["available_minutes"][monday][9:12] == [120, 120, 0]
+    assert data["booked_minutes"][monday][9:12] == [30, 30, 0]
+    assert data["utilization"][monday][9:12] == [0.25, 0.25, None]
+    assert data["utilization"][data["weekdays"].index("Tuesday")] == [None] * 24
+
+def test_appointments_utilization_over_a_year(client, business_owner_token):
+    """Test a year of appointments is aggregated in one request"""
+    db = TestingSessionLocal()
+    add_monday_hours(db)
+    first_monday = date(2030, 1, 7)
+    db.bulk_insert_mappings(Appointment, [
+        booking(first_monday + timedelta(weeks=week), time(9, minute), 15)
+        for week in range(52) for minute in (0, 30)
+    ])
+    db.commit()
+    db.close()
+
+    response = client.get(
+        "/api/business/appointments/utilization?from=2030-01-01&to=2030-12-31",
+        headers={"Authorization": f"Bearer {business_owner_token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    monday = data["weekdays"].index("Monday")
+    assert data["utilization"][monday][9] == 0.5
+    assert data["utilization"][monday][10] == 0.0
+
+def test_appointments_utilization_invalid_range(client, business_owner_token):
+    headers = {"Authorization": f"Bearer {business_owner_token}"}
+    response = client.get("/api/business/appointments/utilization?from=2030-01-08&to=2030-01-07", headers=headers)
+    assert response.status_code == 400
+    response = client.get("/api/business/appointments/utilization?from=2030-01-01&to=2031-06-01", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,172 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta, time
+from app.main import app
+from app.database import Base, get_db
+from app.models import Service, User, Availability, Appointment
+from app.conflicts import ConflictIndex, DayIntervals
+from app.security import create_access_token
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture(autouse=True)
+def test_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def next_monday():
+    today = datetime.now()
+    return today + timedelta(days=(7 - today.weekday()))
+
+def make_business(db, username, phone, service_name):
+    owner = User(
+        first_name="Owner",
+        last_name=username,
+        username=username,
+        phone=phone,
+        password_hash="hashed_password",
+        role="business_owner",
+        business_name=f"{username} Salon"
+    )
+    db.add(owner)
+    db.commit()
+    db.add_all([
+        Service(name=service_name, duration=60, price=100, owner_id=owner.id),
+        Availability(day_of_week="Monday", start_time=time(9, 0), end_time=time(17, 0), owner_id=owner.id)
+    ])
+    db.commit()
+    db.refresh(owner)
+    return owner
+
+def book(client, business_id, service_name, day, start):
+    return client.post(
+        f"/api/shared/appointments?business_id={business_id}",
+        json={
+            "date": day.strftime(f"%Y-%m-%dT{start}:00"),
+            "start_time": start,
+            "title": service_name,
+            "customer_name": "Test Customer",
+            "customer_phone": "1234567890"
+        }
+    )
+
+def test_day_intervals_overlap():
+    intervals = DayIntervals()
+    intervals.add(600, 660, 1)
+    intervals.add(720, 750, 2)
+
+    assert intervals.find_overlap(630, 690) == 1
+    assert intervals.find_overlap(660, 720) is None  # touching edges do not overlap
+    assert intervals.find_overlap(540, 600) is None
+    assert intervals.find_overlap(500, 800) in (1, 2)
+    assert intervals.find_overlap(740, 760) == 2
+
+def test_day_intervals_exclude_and_remove():
+    intervals = DayIntervals()
+    intervals.add(600, 900, 1)  # long appointment covering later ones
+    intervals.add(700, 730, 2)
+
+    assert intervals.find_overlap(800, 830) == 1
+    assert intervals.find_overlap(800, 830, exclude_id=1) is None
+    assert intervals.remove(1)
+    assert intervals.find_overlap(800, 830) is None
+    assert intervals.find_overlap(710, 720) == 2
+    assert not intervals.remove(99)
+
+def test_conflict_index_keeps_most_recent_days(db):
+    index = ConflictIndex(size=2)
+    monday = next_monday().date()
+    for days in range(3):
+        index.get(db, 1, monday + timedelta(days=days))
+    index.get(db, 1, monday + timedelta(days=1))  # most recently used
+    index.get(db, 1, monday + timedelta(days=3))
+    assert len(index) == 2
+    assert set(index._days) == {(1, monday + timedelta(days=1)), (1, monday + timedelta(days=3))}
+
+def test_load_racing_a_booking_is_not_cached(db, monkeypatch):
+    index = ConflictIndex()
+    monday = next_monday().date()
+    load = index._load
+
+    def racing_load(*args):
+        intervals = load(*args)
+        index.add(1, monday, 600, 660, 99)  # committed after our read
+        return intervals
+
+    monkeypatch.setattr(index, "_load", racing_load)
+    assert len(index.get(db, 1, monday)) == 0
+    assert len(index) == 0
+
+def test_same_slot_at_different_businesses(client, db):
+    first = make_business(db, "first", "0500000001", "Haircut A")
+    second = make_business(db, "second", "0500000002", "Haircut B")
+    monday = next_monday()
+
+    assert book(client, first.id, "Haircut A", monday, "10:00").status_code == 200
+    assert book(client, second.id, "Haircut B", monday, "10:00").status_code == 200
+    response = book(client, first.id, "Haircut A", monday, "10:30")
+    assert response.status_code == 400
+    assert "conflicts" in response.json()["detail"]
+
+def test_conflict_index_sees_existing_rows(client, db):
+    owner = make_business(db, "owner", "0500000003", "Massage")
+    monday = next_monday()
+    db.add(Appointment(
+        business_id=owner.id,
+        date=monday.date(),
+        start_time=time(13, 0),
+        duration=60,
+        title="Massage",
+        customer_name="Walk In",
+        customer_phone="0501234567",
+        type="Massage",
+        cost=100
+    ))
+    db.commit()
+
+    response = book(client, owner.id, "Massage", monday, "12:30")
+    assert response.status_code == 400
+    assert book(client, owner.id, "Massage", monday, "14:00").status_code == 200
+
+def test_deleted_appointment_frees_slot(client, db):
+    owner = make_business(db, "owner", "0500000004", "Nails")
+    monday = next_monday()
+
+    created = book(client, owner.id, "Nails", monday, "11:00")
+    appointment_id = created.json()["appointment"]["id"]
+    assert book(client, owner.id, "Nails", monday, "11:00").status_code == 400
+
+    token = create_access_token(data={"sub": owner.username, "role": owner.role})
+    response = client.delete(
+        f"/api/shared/appointments/{appointment_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert book(client, owner.id, "Nails", monday, "11:00").status_code == 200
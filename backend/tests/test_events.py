@@ -0,0 +1,200 @@
+import asyncio
+import threading
+from datetime import datetime, time, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+import app.routes.messages as messages_routes
+import app.routes.shared as shared_routes
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_async_db
+from app.events import EventHub, LocalBackend
+from app.models import Availability, Service, User
+from app.routes.events import event_stream, stream_owner
+from app.security import create_access_token
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+class RecordingBackend(LocalBackend):
+    """Stand-in for the Redis backend that remembers what was published"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, payload):
+        self.published.append((channel, payload))
+        super().publish(channel, payload)
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = EventHub(backend=RecordingBackend(), queue_size=2)
+    monkeypatch.setattr(messages_routes, "event_hub", hub)
+    monkeypatch.setattr(shared_routes, "event_hub", hub)
+    return hub
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def owner(client):
+    db = TestingSessionLocal()
+    db.add(User(first_name="Jane", last_name="Smith", username="janesmith", phone="0987654321",
+                password_hash="hashed_password", role="business_owner", business_name="Jane's Salon"))
+    db.add(User(first_name="John", last_name="Doe", username="johndoe", phone="1234567890",
+                password_hash="hashed_password", role="customer"))
+    db.add(Service(name="Haircut", duration=30, price=80, owner_id=1))
+    db.add(Availability(day_of_week="Monday", start_time=time(9), end_time=time(17), owner_id=1))
+    db.commit()
+    db.close()
+
+def test_event_reaches_only_that_business(hub):
+    async def scenario():
+        mine, other = hub.subscribe(1), hub.subscribe(2)
+        # routes publish from worker threads, not the loop
+        thread = threading.Thread(target=hub.publish, args=(1, "message", {"id": 5}))
+        thread.start()
+        thread.join()
+        frame = await asyncio.wait_for(mine.get(), 1)
+        assert other.queue.empty()
+        return frame
+
+    assert asyncio.run(scenario()) == 'event: message\ndata: {"id": 5}\n\n'
+
+def test_slow_client_drops_events_instead_of_blocking(hub):
+    async def scenario():
+        subscription = hub.subscribe(1)
+        for i in range(5):
+            hub.publish(1, "message", {"id": i})
+        await asyncio.sleep(0)
+        assert subscription.queue.qsize() == 2
+        assert subscription.dropped == 3
+        hub.unsubscribe(subscription)
+        assert hub.connected() == 0
+
+    asyncio.run(scenario())
+
+def test_publish_failure_is_swallowed(hub, monkeypatch):
+    monkeypatch.setattr(hub.backend, "publish", lambda channel, payload: 1 / 0)
+    hub.publish(1, "message", {"id": 1})
+
+def test_stream_sends_events_and_unsubscribes(hub, monkeypatch):
+    import app.routes.events as events_routes
+    monkeypatch.setattr(events_routes, "event_hub", hub)
+    monkeypatch.setattr(events_routes, "EVENTS_KEEPALIVE_SECONDS", 0.01)
+
+    async def scenario():
+        stream = event_stream(hub.subscribe(1))
+        assert (await stream.__anext__()).startswith("retry:")
+        assert await stream.__anext__() == ": keep-alive\n\n"
+        hub.publish(1, "appointment", {"id": 3})
+        assert (await stream.__anext__()).startswith("event: appointment\n")
+        await stream.aclose()
+        assert hub.connected(1) == 0
+
+    asyncio.run(scenario())
+
+def test_stream_requires_business_owner(client):
+    token = create_access_token(data={"sub": "johndoe", "role": "customer", "uid": 2})
+    response = client.get("/api/events/stream", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+def test_stream_requires_owner_id_in_token(client):
+    token = create_access_token(data={"sub": "janesmith", "role": "business_owner"})
+    response = client.get("/api/events/stream", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_sent_message_is_pushed_to_the_business(client, owner, hub):
+    token = create_access_token(data={"sub": "johndoe", "role": "customer", "uid": 2})
+    response = client.post(
+        "/api/messages/send/1",
+        json={"title": "Questions About Services", "content": "Can I come earlier?"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    [(channel, payload)] = hub.backend.published
+    assert channel == "1"
+    assert payload.startswith("event: message\n")
+    assert f'"id": {response.json()["id"]}' in payload
+
+def test_booking_is_pushed_to_the_business(client, owner, hub):
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    response = client.post(
+        "/api/shared/appointments?business_id=1",
+        json={
+            "date": monday.strftime("%Y-%m-%dT10:00:00"),
+            "start_time": "10:00",
+            "title": "Haircut",
+            "customer_name": "John Doe",
+            "customer_phone": "1234567890"
+        }
+    )
+    assert response.status_code == 200
+    rejected = client.post(
+        "/api/shared/appointments?business_id=1",
+        json={
+            "date": monday.strftime("%Y-%m-%dT10:00:00"),
+            "start_time": "10:00",
+            "title": "Haircut",
+            "customer_name": "Someone Else",
+            "customer_phone": "0501234567"
+        }
+    )
+    assert rejected.status_code == 400
+    [(channel, payload)] = hub.backend.published
+    assert channel == "1"
+    assert payload.startswith("event: appointment\n")
+    assert '"customer_name": "John Doe"' in payload
+
+def owner_headers(uid=1):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': 'janesmith', 'role': 'business_owner', 'uid': uid})}"}
+
+def test_ticket_opens_the_stream_for_browsers(client):
+    response = client.post("/api/events/ticket", headers=owner_headers())
+    assert response.status_code == 200
+    claims = stream_owner(ticket=response.json()["ticket"], token=None)
+    assert (claims["sub"], claims["uid"]) == ("janesmith", 1)
+
+def test_ticket_is_only_good_for_the_stream(client):
+    ticket = client.post("/api/events/ticket", headers=owner_headers()).json()["ticket"]
+    response = client.get("/api/shared/me", headers={"Authorization": f"Bearer {ticket}"})
+    assert response.status_code == 401
+    # and an ordinary access token is not a ticket
+    token = owner_headers()["Authorization"].split()[1]
+    assert client.get("/api/events/stream", params={"ticket": token}).status_code == 401
+
+def test_expired_or_missing_ticket_rejected(client):
+    expired = create_access_token(
+        data={"sub": "janesmith", "role": "business_owner", "uid": 1, "scope": "events"},
+        expires_delta=timedelta(seconds=-1)
+    )
+    assert client.get("/api/events/stream", params={"ticket": expired}).status_code == 401
+    assert client.get("/api/events/stream").status_code == 401
+    assert client.post("/api/events/ticket").status_code == 401
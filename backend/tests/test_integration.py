@@ -4,10 +4,12 @@ import os
 os.environ["TESTING"] = "True"  # Set testing environment
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db
+from app.dependencies import get_db, get_async_db
 from datetime import datetime, timedelta
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -23,6 +25,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 def get_next_monday():
     today = datetime.now()
     days_ahead = 0 - today.weekday()  # Monday is 0
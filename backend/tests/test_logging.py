@@ -0,0 +1,49 @@
+import json
+import logging
+import logging.handlers
+
+from app.main import app  # installs the queue handler
+from app.logging_config import DebugSampler, JsonFormatter, parse_levels
+
+def make_record(msg, *args, level=logging.DEBUG, name="app.test", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_root_logs_through_queue():
+    handlers = logging.getLogger().handlers
+    assert any(isinstance(handler, logging.handlers.QueueHandler) for handler in handlers)
+
+def test_module_loggers_propagate_to_root(caplog):
+    with caplog.at_level(logging.DEBUG, logger="app.dependencies"):
+        logging.getLogger("app.dependencies").debug("Authenticated %s (%s)", "johndoe", "customer")
+    assert caplog.records[-1].getMessage() == "Authenticated johndoe (customer)"
+
+def test_debug_sampler_keeps_every_nth_per_template():
+    sampler = DebugSampler(every=3)
+    kept = [sampler.filter(make_record("Authenticated %s", user)) for user in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    # a different template has its own count
+    assert sampler.filter(make_record("Found %d services", 1))
+
+def test_debug_sampler_passes_higher_levels():
+    sampler = DebugSampler(every=100)
+    assert sampler.filter(make_record("Slow", level=logging.DEBUG))
+    assert all(sampler.filter(make_record("Slow", level=logging.WARNING)) for _ in range(5))
+
+def test_parse_levels():
+    assert parse_levels("app.routes.messages=debug, sqlalchemy.engine=WARNING,") == {
+        "app.routes.messages": "DEBUG",
+        "sqlalchemy.engine": "WARNING"
+    }
+    assert parse_levels("") == {}
+
+def test_json_formatter_includes_extras():
+    line = JsonFormatter().format(
+        make_record("Created service %d", 7, level=logging.INFO, owner_id=3)
+    )
+    entry = json.loads(line)
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "Created service 7"
+    assert entry["owner_id"] == 3
@@ -0,0 +1,288 @@
+import pytest
+import create_db
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_async_db
+from app.models import UnreadCounter
+from app.unread import reconcile_unread_counters
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+@pytest.fixture
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def client(test_db):
+    return TestClient(app)
+
+def register_and_login(client, username, phone, role, business_name=None):
+    client.post(
+        "/auth/register",
+        json={
+            "first_name": username.capitalize(),
+            "last_name": "Test",
+            "username": username,
+            "phone": phone,
+            "password": "testpass123",
+            "role": role,
+            "business_name": business_name
+        }
+    )
+    response = client.post("/auth/login", data={"username": username, "password": "testpass123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def owner_headers(client):
+    return register_and_login(client, "janesmith", "0987654321", "business_owner", "Jane's Salon")
+
+@pytest.fixture
+def customer_headers(client):
+    return register_and_login(client, "johndoe", "1234567890", "customer")
+
+def send(client, headers, content="Can I come earlier?"):
+    return client.post(
+        "/api/messages/send/1",
+        json={"title": "Questions About Services", "content": content},
+        headers=headers
+    )
+
+def test_message_lifecycle(client, owner_headers, customer_headers):
+    response = send(client, customer_headers)
+    assert response.status_code == 200
+    assert response.json()["sender_name"] == "Johndoe Test"
+    assert response.json()["recipient_name"] == "Janesmith Test"
+    message_id = response.json()["id"]
+
+    response = client.get("/api/messages/my-messages", headers=owner_headers)
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()] == ["Can I come earlier?"]
+    assert client.get("/api/messages/unread-count", headers=owner_headers).json() == {"unread_count": 1}
+
+    response = client.patch(f"/api/messages/messages/{message_id}/read", headers=owner_headers)
+    assert response.status_code == 200
+    assert client.get("/api/messages/unread-count", headers=owner_headers).json() == {"unread_count": 0}
+
+    response = client.delete(f"/api/messages/messages/{message_id}", headers=owner_headers)
+    assert response.status_code == 200
+    assert client.get("/api/messages/my-messages", headers=owner_headers).json() == []
+
+def test_only_customers_send_messages(client, owner_headers):
+    response = send(client, owner_headers)
+    assert response.status_code == 403
+
+def test_send_message_unknown_business(client, customer_headers):
+    response = client.post(
+        "/api/messages/send/999",
+        json={"title": "Other Inquiries", "content": "Hello"},
+        headers=customer_headers
+    )
+    assert response.status_code == 404
+
+def test_customers_cannot_read_messages(client, customer_headers):
+    response = client.get("/api/messages/my-messages", headers=customer_headers)
+    assert response.status_code == 403
+
+def test_inbox_senders_loaded_in_one_query(client, owner_headers, customer_headers, max_statements):
+    other_headers = register_and_login(client, "marydoe", "5555555555", "customer")
+    for headers in (customer_headers, other_headers, customer_headers):
+        send(client, headers)
+
+    client.get("/api/messages/my-messages", headers=owner_headers)  # owner now cached
+    response = client.get("/api/messages/my-messages", headers=owner_headers)
+    assert max_statements(response, 1) == 1
+    assert [m["sender_name"] for m in response.json()] == ["Johndoe Test", "Marydoe Test", "Johndoe Test"]
+
+def test_inbox_pages_newest_first(client, owner_headers, customer_headers):
+    for i in range(5):
+        send(client, customer_headers, content=f"Message {i}")
+
+    contents, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/messages/my-messages", params=params, headers=owner_headers).json()
+        assert len(page["items"]) <= 2
+        contents += [m["content"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert contents == [f"Message {i}" for i in reversed(range(5))]
+
+def test_inbox_rejects_bad_cursor(client, owner_headers):
+    response = client.get("/api/messages/my-messages", params={"cursor": "garbage"}, headers=owner_headers)
+    assert response.status_code == 400
+    response = client.get("/api/messages/my-messages", params={"limit": 0}, headers=owner_headers)
+    assert response.status_code == 422
+
+def unread(client, headers):
+    return client.get("/api/messages/unread-count", headers=headers).json()["unread_count"]
+
+def test_unread_counter_is_one_primary_key_read(client, owner_headers, customer_headers, max_statements):
+    send(client, customer_headers)
+    unread(client, owner_headers)  # owner now cached
+    response = client.get("/api/messages/unread-count", headers=owner_headers)
+    assert max_statements(response, 1) == 1
+    assert response.json() == {"unread_count": 1}
+
+def test_unread_counter_follows_reads_and_deletes(client, owner_headers, customer_headers):
+    ids = [send(client, customer_headers).json()["id"] for _ in range(3)]
+    assert unread(client, owner_headers) == 3
+
+    for _ in range(2):  # marking twice counts once
+        client.patch(f"/api/messages/messages/{ids[0]}/read", headers=owner_headers)
+    assert unread(client, owner_headers) == 2
+
+    client.delete(f"/api/messages/messages/{ids[0]}", headers=owner_headers)  # already read
+    client.delete(f"/api/messages/messages/{ids[1]}", headers=owner_headers)
+    assert unread(client, owner_headers) == 1
+
+def test_reconcile_rebuilds_counters(client, owner_headers, customer_headers):
+    for _ in range(2):
+        send(client, customer_headers)
+    db = TestingSessionLocal()
+    try:
+        db.get(UnreadCounter, 1).unread = 7
+        db.commit()
+        assert reconcile_unread_counters(db) == 1
+        assert unread(client, owner_headers) == 2
+
+        db.query(UnreadCounter).delete()
+        db.commit()
+        assert unread(client, owner_headers) == 0
+        assert reconcile_unread_counters(db) == 1
+        assert reconcile_unread_counters(db) == 0
+    finally:
+        db.close()
+    assert unread(client, owner_headers) == 2
+
+def test_bulk_read_counts_only_unread(client, owner_headers, customer_headers, max_statements):
+    ids = [send(client, customer_headers).json()["id"] for _ in range(4)]
+    client.patch(f"/api/messages/messages/{ids[0]}/read", headers=owner_headers)
+
+    response = client.patch("/api/messages/messages/read", json={"ids": ids[:3]}, headers=owner_headers)
+    assert response.json() == {"count": 2}
+    max_statements(response, 2)  # the update and the counter
+    assert unread(client, owner_headers) == 1
+
+    response = client.patch("/api/messages/messages/read", json={"read": False}, headers=owner_headers)
+    assert response.json() == {"count": 1}
+    assert unread(client, owner_headers) == 0
+
+def test_bulk_delete_by_filter(client, owner_headers, customer_headers):
+    other_headers = register_and_login(client, "marydoe", "5555555555", "customer")
+    mine = [send(client, customer_headers).json()["id"] for _ in range(3)]
+    send(client, other_headers)
+    client.patch(f"/api/messages/messages/{mine[0]}/read", headers=owner_headers)
+
+    response = client.post("/api/messages/messages/delete", json={"sender_id": 2}, headers=owner_headers)
+    assert response.json() == {"count": 3}
+    assert [m["sender_name"] for m in client.get("/api/messages/my-messages", headers=owner_headers).json()] == [
+        "Marydoe Test"
+    ]
+    assert unread(client, owner_headers) == 1
+
+def test_bulk_actions_stay_in_own_inbox(client, owner_headers, customer_headers):
+    other_owner = register_and_login(client, "bobsmith", "4444444444", "business_owner", "Bob's Barber")
+    ids = [send(client, customer_headers).json()["id"] for _ in range(2)]
+
+    assert client.post("/api/messages/messages/delete", json={"ids": ids}, headers=other_owner).json() == {"count": 0}
+    assert client.patch("/api/messages/messages/read", json={"ids": ids}, headers=other_owner).json() == {"count": 0}
+    assert unread(client, owner_headers) == 2
+
+def test_bulk_action_needs_a_selection(client, owner_headers, customer_headers):
+    assert client.post("/api/messages/messages/delete", json={}, headers=owner_headers).status_code == 422
+    assert client.patch("/api/messages/messages/read", json={"ids": []}, headers=owner_headers).status_code == 422
+    assert client.patch("/api/messages/messages/read", json={"read": False}, headers=customer_headers).status_code == 403
+
+def search(client, headers, q, **params):
+    return client.get("/api/messages/search", params={"q": q, **params}, headers=headers)
+
+def test_search_ranks_matches(client, owner_headers, customer_headers):
+    send(client, customer_headers, content="Do you sell shampoo?")
+    send(client, customer_headers, content="Haircut tomorrow, haircut for my son too")
+    send(client, customer_headers, content="Is a haircut possible on Friday? Friday works best")
+
+    response = search(client, owner_headers, "haircut")
+    assert response.status_code == 200
+    assert [m["content"] for m in response.json()["items"]] == [
+        "Haircut tomorrow, haircut for my son too",
+        "Is a haircut possible on Friday? Friday works best"
+    ]
+    # every word must match, as a prefix
+    assert [m["content"] for m in search(client, owner_headers, "FRI hair").json()["items"]] == [
+        "Is a haircut possible on Friday? Friday works best"
+    ]
+    assert search(client, owner_headers, "haircut", title="Other Inquiries").json()["items"] == []
+
+def test_search_pages_through_results(client, owner_headers, customer_headers):
+    for i in range(5):
+        send(client, customer_headers, content=f"Reschedule please {'soon ' * i}")
+
+    contents, params = [], {"limit": 2}
+    while True:
+        page = search(client, owner_headers, "reschedule", **params).json()
+        contents += [m["content"] for m in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": page["next_cursor"]}
+    assert sorted(contents) == sorted(f"Reschedule please {'soon ' * i}" for i in range(5))
+    assert len(contents) == 5
+
+def test_search_follows_deletes_and_stays_in_own_inbox(client, owner_headers, customer_headers):
+    other_owner = register_and_login(client, "bobsmith", "4444444444", "business_owner", "Bob's Barber")
+    message_id = send(client, customer_headers, content="Refund for the color treatment").json()["id"]
+    assert search(client, other_owner, "refund").json()["items"] == []
+
+    client.delete(f"/api/messages/messages/{message_id}", headers=owner_headers)
+    assert search(client, owner_headers, "refund").json() == {"items": [], "next_cursor": None}
+
+def test_search_input_is_never_a_syntax_error(client, owner_headers, customer_headers):
+    send(client, customer_headers, content="What's the price?")
+    for q in ['"unbalanced', "price OR", "-+*()", "NEAR(price"]:
+        assert search(client, owner_headers, q).status_code == 200, q
+    assert len(search(client, owner_headers, 'price"').json()["items"]) == 1
+    assert search(client, customer_headers, "price").status_code == 403
+
+def test_migration_adds_search_to_an_existing_database(client, owner_headers, customer_headers, monkeypatch):
+    send(client, customer_headers, content="Sent before search existed")
+    with engine.begin() as connection:  # a database created before messages_fts
+        connection.execute(text("DROP TABLE messages_fts"))
+        for trigger in ("insert", "delete", "update"):
+            connection.execute(text(f"DROP TRIGGER messages_fts_{trigger}"))
+
+    monkeypatch.setattr(create_db, "engine", engine)
+    create_db.add_message_search_table()
+    create_db.add_message_search_table()  # running it again changes nothing
+    send(client, customer_headers, content="Sent after the migration")
+
+    assert sorted(m["content"] for m in search(client, owner_headers, "sent").json()["items"]) == [
+        "Sent after the migration", "Sent before search existed"
+    ]
+    assert len(search(client, owner_headers, "existed").json()["items"]) == 1
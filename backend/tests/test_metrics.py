@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+import app.dependencies as dependencies
+from app.database import Base
+from app.dependencies import get_db
+from app.metrics import MetricsMiddleware, RequestMetrics, request_metrics
+from app.query_stats import route_query_totals
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    request_metrics.clear()
+    route_query_totals.clear()
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+def test_histogram_buckets_are_cumulative():
+    metrics = RequestMetrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        metrics.started()
+        metrics.finished("GET", "/x", 200, seconds)
+    lines = metrics.render()
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x",le="0.1"} 2' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x",le="1.0"} 3' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x",le="+Inf"} 4' in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/x"} 4' in lines
+    assert "http_requests_in_progress 0" in lines
+
+def test_metrics_endpoint(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "s3cret")
+    for business_id in (1, 2):
+        client.get(f"/api/services/public/businesses/{business_id}/services")
+    client.get("/no/such/page")
+
+    response = client.get("/metrics", headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    route = "/api/services/public/businesses/{business_id}/services"
+    assert f'http_requests_total{{method="GET",route="{route}",status="404"}} 2' in body
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}"}} 2' in body
+    assert 'http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in body
+    assert f'db_statements_total{{route="{route}"}} 2' in body
+    assert 'db_pool_checked_out{pool="primary"}' in body
+
+def test_metrics_require_internal_token(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+def test_unhandled_exceptions_count_as_errors():
+    metrics = RequestMetrics()
+
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(MetricsMiddleware(failing_app, metrics)(
+            {"type": "http", "method": "POST", "path": "/boom"}, None, None
+        ))
+    lines = metrics.render()
+    assert 'http_requests_total{method="POST",route="<unmatched>",status="500"} 1' in lines
+    assert 'http_request_errors_total{method="POST",route="<unmatched>"} 1' in lines
+    assert "http_requests_in_progress 0" in lines
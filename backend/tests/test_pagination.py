@@ -0,0 +1,139 @@
+from datetime import datetime, time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_async_db
+from app.models import Appointment, Availability, User
+import app.pagination as pagination
+from app.pagination import Keyset
+from app.security import create_access_token
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def owner(client):
+    db = TestingSessionLocal()
+    for i in range(3):
+        db.add(User(first_name="Owner", last_name=str(i), username=f"owner{i}", phone=f"050000000{i}",
+                    password_hash="hashed_password", role="business_owner", business_name=f"Salon {i}"))
+    db.add(User(first_name="John", last_name="Doe", username="johndoe", phone="0521234567",
+                password_hash="hashed_password", role="customer"))
+    db.flush()
+    # two appointments share a date and start time, so only the id tells them apart
+    for day, start in [(3, 9), (1, 10), (2, 9), (1, 10), (2, 14)]:
+        db.add(Appointment(business_id=1, date=datetime(2025, 1, day), start_time=time(start), duration=30,
+                           title="Haircut", customer_name="John Doe", customer_phone="0521234567",
+                           type="Haircut", cost=80))
+    for day, start in [("Monday", 9), ("Sunday", 9), ("Monday", 13)]:
+        db.add(Availability(owner_id=1, day_of_week=day, start_time=time(start), end_time=time(start + 3)))
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': 'owner0', 'role': 'business_owner'})}"}
+
+def walk(client, url, headers=None, limit=2):
+    """Every item of a paginated list, following next_cursor"""
+    items, params = [], {"limit": limit}
+    while True:
+        page = client.get(url, params=params, headers=headers)
+        assert page.status_code == 200, page.json()
+        body = page.json()
+        assert len(body["items"]) <= limit
+        items += body["items"]
+        if body["next_cursor"] is None:
+            return items
+        params = {"limit": limit, "cursor": body["next_cursor"]}
+
+def test_cursor_round_trip():
+    order = Keyset(Appointment.date, Appointment.start_time, Appointment.id)
+    row = Appointment(id=7, date=datetime(2025, 1, 2), start_time=time(9, 30))
+    assert order.decode(order.encode(row)) == (datetime(2025, 1, 2), time(9, 30), 7)
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "WzFd"])  # WzFd is [1], too short
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        Keyset(Appointment.date, Appointment.id).decode(cursor)
+    assert error.value.status_code == 400
+
+def test_pages_match_unpaginated_order(client, owner):
+    customer = {"Authorization": f"Bearer {create_access_token(data={'sub': 'johndoe', 'role': 'customer'})}"}
+    for url, headers in [
+        ("/api/business/my-appointments", owner),
+        ("/api/business/appointments?business_id=1", owner),
+        ("/api/shared/appointments/search-by-user", customer),
+        ("/api/services/public/businesses", None),
+        ("/api/availability/my-availability", owner),
+    ]:
+        everything = client.get(url, headers=headers).json()
+        assert isinstance(everything, list) and len(everything) >= 3
+        assert walk(client, url, headers) == everything, url
+
+def test_sort_orders(client, owner):
+    newest_first = client.get("/api/business/my-appointments", headers=owner).json()
+    assert [(a["date"][:10], a["start_time"]) for a in newest_first] == [
+        ("2025-01-03", "09:00:00"), ("2025-01-02", "14:00:00"), ("2025-01-02", "09:00:00"),
+        ("2025-01-01", "10:00:00"), ("2025-01-01", "10:00:00")
+    ]
+    calendar = client.get("/api/business/appointments?business_id=1", headers=owner).json()
+    assert [a["id"] for a in calendar] == [2, 4, 3, 5, 1]
+    schedule = client.get("/api/availability/my-availability", headers=owner).json()
+    assert [(s["day_of_week"], s["start_time"]) for s in schedule] == [
+        ("Monday", "09:00:00"), ("Monday", "13:00:00"), ("Sunday", "09:00:00")
+    ]
+
+def test_limit_bounds(client, owner):
+    assert client.get("/api/business/my-appointments", params={"limit": 101}, headers=owner).status_code == 422
+    page = client.get("/api/business/my-appointments", params={"limit": 100}, headers=owner).json()
+    assert len(page["items"]) == 5 and page["next_cursor"] is None
+
+def test_bare_lists_are_capped(client, owner, monkeypatch):
+    monkeypatch.setattr(pagination, "BARE_LIST_LIMIT", 3)
+    response = client.get("/api/business/my-appointments", headers=owner)
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert response.headers["Deprecation"] == "true"
+
+    # the Link header continues the list as a page
+    link = response.headers["Link"]
+    assert link.endswith('>; rel="next"')
+    rest = client.get(link[1:link.index(">")], headers=owner).json()
+    assert [a["id"] for a in response.json() + rest["items"]] == [1, 5, 3, 4, 2]
+    assert rest["next_cursor"] is None
+
+    response = client.get("/api/availability/my-availability", headers=owner)
+    assert len(response.json()) == 3 and "Link" not in response.headers
+
+    page = client.get("/api/business/my-appointments", params={"limit": 2}, headers=owner)
+    assert "Deprecation" not in page.headers and "Link" not in page.headers
@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from app.main import app
+import app.dependencies as dependencies
+from app.pool_monitor import PoolMonitor
+
+@pytest.fixture
+def monitored():
+    monitor = PoolMonitor("test", slow_wait_ms=50)
+    engine = monitor.watch(create_engine(
+        "sqlite:///./test.db",
+        connect_args={"check_same_thread": False},
+        poolclass=monitor.pool_class(QueuePool),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1
+    ))
+    yield monitor, engine
+    engine.dispose()
+
+def test_pool_monitor_counts_checkouts(monitored):
+    monitor, engine = monitored
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = monitor.stats()
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 3
+    assert stats["checkins"] == 3
+    assert stats["checked_out"] == 0
+    assert stats["timeouts"] == 0
+
+def test_pool_monitor_reports_exhaustion(monitored, caplog):
+    monitor, engine = monitored
+    held = engine.connect()
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.pool_monitor"):
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+        stats = monitor.stats()
+        assert stats["checked_out"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["slow_waits"] == 1
+        assert stats["max_wait_ms"] >= 100
+        assert "test pool timed out" in caplog.text
+    finally:
+        held.close()
+
+def test_pool_monitor_survives_dispose(monitored):
+    monitor, engine = monitored
+    engine.dispose()
+    with pytest.raises(PoolTimeoutError):
+        with engine.connect():
+            engine.connect()
+    assert monitor.stats()["timeouts"] == 1
+
+def test_internal_endpoints_need_the_token(monkeypatch):
+    client = TestClient(app)
+    assert client.get("/internal/pool").status_code == 404  # off without INTERNAL_TOKEN
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "s3cret")
+    assert client.get("/internal/pool").status_code == 403
+    assert client.get("/internal/queries", headers={"X-Internal-Token": "wrong"}).status_code == 403
+
+def test_internal_pool_endpoint(monkeypatch):
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "s3cret")
+    response = TestClient(app).get("/internal/pool", headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200
+    primary = response.json()["primary"]
+    for key in ("size", "checked_out", "overflow", "avg_wait_ms", "max_wait_ms", "timeouts"):
+        assert key in primary
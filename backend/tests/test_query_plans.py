@@ -0,0 +1,64 @@
+import re
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import date
+from app.database import Base
+from app.conflicts import day_appointments_query
+from app.slots import owner_appointments_query, owner_runs_query
+from app.routes.business_extras import business_day_appointments
+from app.message_search import inbox_search
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def explain(db, query):
+    """Run the database's EXPLAIN for a Query or select() and return the plan rows"""
+    dialect = db.get_bind().dialect
+    compiled = getattr(query, "statement", query).compile(dialect=dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    return db.connection().exec_driver_sql(prefix + str(compiled), params).mappings().all()
+
+def assert_no_table_scan(db, query, table="appointments"):
+    plan = explain(db, query)
+    if db.get_bind().dialect.name == "sqlite":
+        scans = [row["detail"] for row in plan if re.match(rf"SCAN (TABLE )?{table}\b", row["detail"])]
+    else:
+        scans = [row for row in plan if row["table"] == table and row["type"] == "ALL"]
+    assert not scans, f"full scan of {table}: {plan}"
+
+def test_conflict_check_uses_index(db):
+    assert_no_table_scan(db, day_appointments_query(db, 1, date(2030, 1, 7)))
+
+def test_free_slot_range_uses_index(db):
+    assert_no_table_scan(db, owner_appointments_query(db, 1, date(2030, 1, 7), date(2030, 2, 7)))
+
+def test_scattered_days_use_index(db):
+    runs = [(date(2030, 1, 7), date(2030, 1, 7)), (date(2031, 1, 6), date(2031, 1, 8))]
+    assert_no_table_scan(db, owner_runs_query(db, 1, runs))
+
+def test_daily_stats_uses_index(db):
+    assert_no_table_scan(db, business_day_appointments(db, 1, date(2030, 1, 7)))
+
+def test_message_search_uses_full_text_index(db):
+    query, _ = inbox_search(db.get_bind().dialect.name, 1, ["haircut"])
+    assert_no_table_scan(db, query, table="messages")
+    if db.get_bind().dialect.name == "sqlite":
+        # driven by the match: each hit is fetched by primary key, not each inbox row matched
+        assert [row["detail"].split()[0] for row in explain(db, query)] == ["SCAN", "SEARCH"]
+        assert "PRIMARY KEY" in explain(db, query)[1]["detail"]
@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+import app.dependencies as dependencies
+from app.database import Base
+from app.dependencies import get_db
+from app.query_stats import route_query_totals, RequestQueries, STATEMENTS_HEADER, DB_TIME_HEADER, _current
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    route_query_totals.clear()
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+def test_headers_only_in_debug_mode(client, max_statements):
+    response = client.get("/api/services/public/businesses")
+    assert max_statements(response, 1) == 1
+    assert float(response.headers[DB_TIME_HEADER]) > 0
+
+def test_headers_off_by_default(client):
+    response = client.get("/api/services/public/businesses")
+    assert STATEMENTS_HEADER not in response.headers
+
+def test_totals_recorded_per_route_template(client, monkeypatch):
+    for business_id in (1, 2, 3):
+        client.get(f"/api/services/public/businesses/{business_id}/services")
+
+    monkeypatch.setattr(dependencies, "INTERNAL_TOKEN", "s3cret")
+    totals = client.get("/internal/queries", headers={"X-Internal-Token": "s3cret"}).json()
+    services = totals["/api/services/public/businesses/{business_id}/services"]
+    assert services["requests"] == 3
+    assert services["statements"] == 3
+    assert services["max_statements"] == 1
+
+def test_failed_statement_leaves_no_timer_behind():
+    queries = RequestQueries()
+    token = _current.set(queries)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+            connection.execute(text("SELECT 1"))
+    finally:
+        _current.reset(token)
+    assert queries.statements == 2
+    assert queries.db_time > 0
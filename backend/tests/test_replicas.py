@@ -0,0 +1,130 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import app.database as database
+import app.main as main
+from app.main import app
+from app.database import Base, get_db, replica_sessionmaker
+from app.models import Service, User
+from app.schedules import schedule_cache
+from app.user_cache import user_cache
+from app.security import create_access_token
+
+# Two SQLite files stand in for the primary and its replica
+PRIMARY_URL = "sqlite:///./test.db"
+REPLICA_URL = "sqlite:///./test_replica.db"
+primary = create_engine(PRIMARY_URL, connect_args={"check_same_thread": False})
+replica = create_engine(REPLICA_URL, connect_args={"check_same_thread": False})
+
+@pytest.fixture(autouse=True)
+def routed_sessions(monkeypatch):
+    for engine in (primary, replica):
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=primary))
+    monkeypatch.setattr(database, "ReplicaSessionLocal", replica_sessionmaker(primary, replica))
+    # exercise the real get_db rather than the per-file test override
+    monkeypatch.delitem(app.dependency_overrides, get_db, raising=False)
+    yield
+    for engine in (primary, replica):
+        Base.metadata.drop_all(bind=engine)
+    replica.dispose()
+    if os.path.exists("./test_replica.db"):
+        os.remove("./test_replica.db")
+
+def add_owner(engine, username="janesmith"):
+    db = sessionmaker(bind=engine)()
+    owner = User(
+        first_name="Jane",
+        last_name="Smith",
+        username=username,
+        phone="0987654321",
+        password_hash="hashed_password",
+        role="business_owner",
+        business_name="Jane's Salon"
+    )
+    db.add(owner)
+    db.commit()
+    db.add(Service(name=f"Haircut {engine.url.database}", duration=30, price=80, owner_id=owner.id))
+    db.commit()
+    db.close()
+
+def test_replica_session_reads_replica_and_writes_primary():
+    add_owner(replica)
+    db = database.ReplicaSessionLocal()
+    try:
+        assert db.query(User).count() == 1  # read from the replica
+        db.add(User(
+            first_name="John",
+            last_name="Doe",
+            username="johndoe",
+            phone="1234567890",
+            password_hash="hashed_password",
+            role="customer"
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    assert sessionmaker(bind=primary)().query(User.username).all() == [("johndoe",)]
+    assert sessionmaker(bind=replica)().query(User).count() == 1
+
+def test_get_requests_read_from_replica():
+    add_owner(replica)
+    response = TestClient(app).get("/api/services/public/businesses")
+    assert response.status_code == 200
+    assert [business["username"] for business in response.json()] == ["janesmith"]
+
+def test_writes_go_to_primary():
+    response = TestClient(app).post("/auth/register", json={
+        "first_name": "Jane",
+        "last_name": "Smith",
+        "username": "janesmith",
+        "phone": "0987654321",
+        "password": "testpass123",
+        "role": "business_owner",
+        "business_name": "Jane's Salon"
+    })
+    assert response.status_code == 200
+    assert sessionmaker(bind=primary)().query(User).count() == 1
+    assert sessionmaker(bind=replica)().query(User).count() == 0
+
+def test_use_primary_reads_own_writes():
+    add_owner(primary)  # not replicated yet
+    token = create_access_token(data={"sub": "janesmith", "role": "business_owner"})
+    response = TestClient(app).get(
+        "/api/services/my-services",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert [service["name"] for service in response.json()] == ["Haircut ./test.db"]
+
+def test_replica_reads_are_not_cached():
+    add_owner(replica)
+    db = database.ReplicaSessionLocal()
+    try:
+        schedule_cache.get(db, 1)
+        user_cache.get(db, 1)
+    finally:
+        db.close()
+    assert 1 not in schedule_cache._schedules
+    assert 1 not in user_cache._users
+
+def test_shutdown_disposes_replica_engine(monkeypatch):
+    disposed = []
+
+    class Engine:
+        def __init__(self, name):
+            self.name = name
+
+        async def dispose(self):
+            disposed.append(self.name)
+
+    monkeypatch.setattr(main, "async_engine", Engine("primary"))
+    monkeypatch.setattr(main, "async_replica_engine", Engine("replica"))
+    with TestClient(app):
+        pass
+    assert disposed == ["primary", "replica"]
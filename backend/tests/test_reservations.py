@@ -0,0 +1,203 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import Base, get_db
+from app.models import Service, User, Availability, Appointment, BookingDay
+from app.conflicts import conflict_index
+from app.reservations import committed_conflict, lock_days
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    pool_size=32
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+@pytest.fixture(autouse=True)
+def test_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def business(db):
+    owner = User(
+        first_name="Jane",
+        last_name="Smith",
+        username="janesmith",
+        phone="0987654321",
+        password_hash="hashed_password",
+        role="business_owner",
+        business_name="Jane's Salon"
+    )
+    db.add(owner)
+    db.commit()
+    db.add_all([
+        Service(name="Haircut", duration=30, price=80, owner_id=owner.id),
+        Availability(day_of_week="Monday", start_time=time(9, 0), end_time=time(17, 0), owner_id=owner.id)
+    ])
+    db.commit()
+    db.refresh(owner)
+    return owner
+
+def next_monday():
+    today = datetime.now()
+    return today + timedelta(days=(7 - today.weekday()))
+
+def test_adjacent_bookings_off_the_hour(db, business):
+    """A 12-minute service booked back to back: each start is free, and each booking succeeds"""
+    db.add(Service(name="Beard trim", duration=12, price=40, owner_id=business.id))
+    db.commit()
+    client = TestClient(app)
+    monday = next_monday()
+
+    def book(start):
+        return client.post(
+            f"/api/shared/appointments?business_id={business.id}",
+            json={
+                "date": monday.strftime(f"%Y-%m-%dT{start}:00"),
+                "start_time": start,
+                "title": "Beard trim",
+                "customer_name": f"Customer {start}",
+                "customer_phone": "0501234567"
+            }
+        )
+
+    assert book("10:00").status_code == 200
+    day = monday.strftime("%Y-%m-%d")
+    free = client.get(
+        f"/api/shared/businesses/{business.id}/free-slots",
+        params={"service": "Beard trim", "from": day, "to": day, "step": 1}
+    ).json()
+    assert "10:12" in free["days"][0]["start_times"]
+    assert book("10:12").status_code == 200
+    assert book("10:24").status_code == 200
+    assert book("10:30").status_code == 400
+
+    response = client.post(
+        f"/api/shared/appointments/batch?business_id={business.id}",
+        json={"appointments": [
+            {
+                "date": monday.strftime(f"%Y-%m-%dT{start}:00"),
+                "start_time": start,
+                "title": "Beard trim",
+                "customer_name": "Batch Customer",
+                "customer_phone": "0501234567"
+            }
+            for start in ("11:00", "11:12", "11:24")
+        ]}
+    )
+    assert response.json()["created"] == 3
+
+def walk_in(business, day, start, duration=30):
+    """An appointment committed by someone else, behind this worker's conflict index"""
+    other = TestingSessionLocal()
+    try:
+        other.add(Appointment(
+            business_id=business.id, date=day, start_time=start, duration=duration, title="Haircut",
+            customer_name="Walk In", customer_phone="1", type="Haircut", cost=80
+        ))
+        other.commit()
+    finally:
+        other.close()
+
+def test_recheck_under_lock_sees_committed_bookings(db, business):
+    day = next_monday().date()
+    walk_in(business, day, time(10, 0))
+
+    lock_days(db, business.id, [day, day])
+    assert committed_conflict(db, business.id, [(day, 615, 30)])
+    assert not committed_conflict(db, business.id, [(day, 630, 30), (day, 570, 30)])
+    apt_id = db.query(Appointment.id).scalar()
+    assert not committed_conflict(db, business.id, [(day, 615, 30)], exclude_id=apt_id)
+    db.commit()
+
+    lock_days(db, business.id, [day])
+    db.commit()
+    assert db.query(BookingDay.version).filter(BookingDay.business_id == business.id).all() == [(2,)]
+
+def test_stale_conflict_index_cannot_double_book(db, business):
+    client = TestClient(app)
+    monday = next_monday()
+    conflict_index.get(db, business.id, monday.date())  # cached while the day is empty
+    walk_in(business, monday.date(), time(10, 0))
+
+    response = client.post(
+        f"/api/shared/appointments?business_id={business.id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT10:15:00"),
+            "start_time": "10:15",
+            "title": "Haircut",
+            "customer_name": "Late",
+            "customer_phone": "0501234567"
+        }
+    )
+    assert response.status_code == 400
+    assert "conflicts" in response.json()["detail"]
+    assert db.query(Appointment).count() == 1
+
+def test_concurrent_bookings_stress(business):
+    """Hundreds of simultaneous bookings for the same few slots: one winner per slot"""
+    client = TestClient(app)
+    monday = next_monday()
+    starts = [f"{hour:02d}:{minute:02d}" for hour in range(10, 15) for minute in (0, 30)]
+    attempts_per_slot = 30
+
+    def book(attempt):
+        start = starts[attempt % len(starts)]
+        response = client.post(
+            f"/api/shared/appointments?business_id={business.id}",
+            json={
+                "date": monday.strftime(f"%Y-%m-%dT{start}:00"),
+                "start_time": start,
+                "title": "Haircut",
+                "customer_name": f"Customer {attempt}",
+                "customer_phone": f"050{attempt:07d}"
+            }
+        )
+        return start, response.status_code
+
+    # throughput is measured by benchmarks/bench_bookings.py
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(book, range(len(starts) * attempts_per_slot)))
+
+    winners = [start for start, status in results if status == 200]
+    assert sorted(winners) == sorted(starts)
+    assert all(status in (200, 400) for _, status in results)
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(Appointment).count() == len(starts)
+        booked = sorted((apt.start_time, apt.duration) for apt in db.query(Appointment))
+        assert all(
+            (start.hour * 60 + start.minute) + duration <= later.hour * 60 + later.minute
+            for (start, duration), (later, _) in zip(booked, booked[1:])
+        )
+        # one lock row for the day, however many bookings raced for it
+        assert db.query(BookingDay).count() == 1
+    finally:
+        db.close()
@@ -1,11 +1,13 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
 from app.database import Base
-from app.dependencies import get_db
-from app.models import Service, User
+from app.dependencies import get_db, get_async_db
+from app.models import Service, Topic, User
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -20,6 +22,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 @pytest.fixture
 def test_db():
     Base.metadata.create_all(bind=engine)
@@ -155,4 +166,39 @@ def test_create_service_missing_fields(client, business_owner_token):
             "name": "Missing Fields Service"
         }
     )
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+def add_businesses(count):
+    db = TestingSessionLocal()
+    for i in range(count):
+        owner = User(
+            first_name="Owner",
+            last_name=str(i),
+            username=f"owner{i}",
+            phone=f"05{i:08d}",
+            password_hash="hashed_password",
+            role="business_owner",
+            business_name=f"Business {i}"
+        )
+        db.add(owner)
+        db.flush()
+        for j in range(3):
+            service = Service(name=f"Service {i}-{j}", duration=30, price=50, owner_id=owner.id)
+            db.add(service)
+            db.flush()
+            db.add(Topic(name=f"Topic {i}-{j}", duration=30, cost=50, service_id=service.id))
+    db.commit()
+    db.close()
+
+def test_public_catalog_statement_count(client, max_statements):
+    """Listing businesses must not load services and topics per row"""
+    add_businesses(10)
+    response = client.get("/api/services/public/businesses")
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    max_statements(response, 3)
+
+    response = client.get("/api/services/public/businesses/1/services")
+    assert response.status_code == 200
+    max_statements(response, 2)
+
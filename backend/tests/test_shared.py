@@ -1,11 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime, timedelta, time
+from datetime import date, datetime, timedelta, time
 from app.main import app
 from app.database import Base, get_db
-from app.models import Service, User, Availability, Appointment
+from app.models import Service, User, Availability, Appointment, Topic
+from app.slots import day_runs, iter_free_slots, owner_appointments_on_days
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -191,3 +192,311 @@ def test_create_appointment_no_availability(client, test_service, db):
     assert response.status_code == 400
     assert "not available" in response.json()["detail"]
 
+
+def test_get_free_slots(client, test_service, test_availability):
+    """Test free slots skip booked time and stay inside business hours"""
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    client.post(
+        f"/api/shared/appointments?business_id={test_service.owner_id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT10:00:00"),
+            "start_time": "10:00",
+            "title": test_service.name,
+            "customer_name": "Test Customer",
+            "customer_phone": "1234567890"
+        }
+    )
+
+    response = client.get(
+        f"/api/shared/businesses/{test_service.owner_id}/free-slots",
+        params={
+            "service": test_service.name,
+            "from": monday.strftime("%Y-%m-%d"),
+            "to": (monday + timedelta(days=6)).strftime("%Y-%m-%d"),
+            "step": 30
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["duration"] == 60
+    assert len(data["days"]) == 1  # only Monday has availability
+    assert data["days"][0]["day"] == monday.strftime("%Y-%m-%d")
+    assert data["days"][0]["start_times"] == [
+        "09:00", "11:00", "11:30", "12:00", "12:30", "13:00",
+        "13:30", "14:00", "14:30", "15:00", "15:30", "16:00"
+    ]
+
+def test_get_free_slots_invalid_service(client, test_service, test_availability):
+    """Test free slots with a service the business doesn't offer"""
+    response = client.get(
+        f"/api/shared/businesses/{test_service.owner_id}/free-slots",
+        params={"service": "Unknown", "from": "2030-01-07", "to": "2030-01-08"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"]["available_services"] == [test_service.name]
+
+def test_get_free_slots_invalid_range(client, test_service):
+    """Test free slots rejects reversed and oversized ranges"""
+    url = f"/api/shared/businesses/{test_service.owner_id}/free-slots"
+    response = client.get(url, params={"service": test_service.name, "from": "2030-01-08", "to": "2030-01-07"})
+    assert response.status_code == 400
+    response = client.get(url, params={"service": test_service.name, "from": "2030-01-01", "to": "2030-12-31"})
+    assert response.status_code == 400
+
+def test_get_earliest_slots(client, test_service, test_availability, db):
+    """Test the earliest slots are merged in time order across businesses"""
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    client.post(
+        f"/api/shared/appointments?business_id={test_service.owner_id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT09:00:00"),
+            "start_time": "09:00",
+            "title": test_service.name,
+            "customer_name": "Test Customer",
+            "customer_phone": "1234567890"
+        }
+    )
+    other = User(
+        first_name="Bob",
+        last_name="Brown",
+        username="bobbrown",
+        phone="0541234567",
+        password_hash="hashed_password",
+        role="business_owner",
+        business_name="Bob's Barber"
+    )
+    db.add(other)
+    db.commit()
+    db.add_all([
+        Service(name="Quick Test Service", duration=30, price=40, owner_id=other.id),
+        Service(name="Massage", duration=30, price=40, owner_id=other.id),
+        Availability(day_of_week="Monday", start_time=time(9, 30), end_time=time(10, 30), owner_id=other.id)
+    ])
+    db.commit()
+
+    response = client.get("/api/shared/earliest-slots", params={
+        "service": "test service",
+        "from": monday.strftime("%Y-%m-%dT00:00:00"),
+        "to": (monday + timedelta(days=7)).strftime("%Y-%m-%dT00:00:00"),
+        "limit": 4,
+        "step": 30
+    })
+    assert response.status_code == 200
+    slots = [(slot["business_name"], slot["start"][11:16]) for slot in response.json()]
+    assert slots == [
+        ("Bob's Barber", "09:30"),
+        ("Jane's Salon", "10:00"),
+        ("Bob's Barber", "10:00"),
+        ("Jane's Salon", "10:30")
+    ]
+
+def test_earliest_slots_stop_loading_once_limit_is_reached(test_service, test_availability, db):
+    """Test a stream only reads the calendar chunks its consumer asks for"""
+    monday = datetime.combine(datetime.now() + timedelta(days=(7 - datetime.now().weekday())), time())
+    slots = iter_free_slots(db, test_service.owner_id, 60, monday, monday + timedelta(days=365), step=60)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert next(slots) == monday.replace(hour=9)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    appointment_reads = [sql for sql in statements if "FROM appointments" in sql]
+    assert len(appointment_reads) == 1
+
+def test_get_earliest_slots_validation(client, test_service):
+    """Test the earliest slots search rejects blank keywords and bad windows"""
+    url = "/api/shared/earliest-slots"
+    response = client.get(url, params={"service": " ", "from": "2030-01-07T00:00:00", "to": "2030-01-08T00:00:00"})
+    assert response.status_code == 400
+    response = client.get(url, params={"service": "Test", "from": "2030-01-08T00:00:00", "to": "2030-01-07T00:00:00"})
+    assert response.status_code == 400
+    response = client.get(url, params={"service": "Test", "from": "2030-01-01T00:00:00", "to": "2030-03-01T00:00:00"})
+    assert response.status_code == 400
+
+def test_earliest_slots_accept_utc_window(client, test_service, test_availability):
+    """Test a Z-suffixed window is read as UTC and compared in local time"""
+    response = client.get("/api/shared/earliest-slots", params={
+        "service": "test service",
+        "from": "2030-01-07T07:30:00Z",  # 09:30 in Israel (UTC+2 in January)
+        "to": "2030-01-08T08:00:00Z",
+        "limit": 2,
+        "step": 30
+    })
+    assert response.status_code == 200
+    assert [slot["start"][:16] for slot in response.json()] == ["2030-01-07T09:30", "2030-01-07T10:00"]
+
+def test_available_topics_statement_count(client, test_service, db, max_statements):
+    """Topics are listed with their service and owner in a single query"""
+    db.add_all([
+        Topic(name=f"Topic {i}", duration=30, cost=50, service_id=test_service.id)
+        for i in range(5)
+    ])
+    db.commit()
+    response = client.get("/api/shared/available-topics")
+    assert response.status_code == 200
+    assert response.json()[0]["business_owner"] == "Jane Smith"
+    assert len(response.json()) == 5
+    max_statements(response, 1)
+
+def test_create_appointments_batch(client, test_service, test_availability, db):
+    """Test batch booking reports a result per item and inserts the valid ones"""
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    client.post(
+        f"/api/shared/appointments?business_id={test_service.owner_id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT09:00:00"),
+            "start_time": "09:00",
+            "title": test_service.name,
+            "customer_name": "Existing Customer",
+            "customer_phone": "1234567890"
+        }
+    )
+
+    def item(start, title=test_service.name, day=monday):
+        return {
+            "date": day.strftime(f"%Y-%m-%dT{start}:00"),
+            "start_time": start,
+            "title": title,
+            "customer_name": "Batch Customer",
+            "customer_phone": "0501234567"
+        }
+
+    response = client.post(
+        f"/api/shared/appointments/batch?business_id={test_service.owner_id}",
+        json={"appointments": [
+            item("11:00"),
+            item("09:30"),                          # overlaps the existing booking
+            item("13:00"),
+            item("13:30"),                          # overlaps item 2
+            item("16:30"),                          # runs past closing time
+            item("12:00", title="Unknown"),
+            item("12:00", day=monday + timedelta(days=1)),  # no Tuesday availability
+        ]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 1
+    assert data["failed"] == 6
+    results = data["results"]
+    assert [r["success"] for r in results] == [True, False, False, False, False, False, False]
+    assert results[0]["appointment"]["start_time"] == "11:00:00"
+    assert "existing appointment" in results[1]["error"]
+    assert "same batch" in results[2]["error"]
+    assert "same batch" in results[3]["error"]
+    assert "outside business hours" in results[4]["error"]
+    assert "Invalid service" in results[5]["error"]
+    assert "not available" in results[6]["error"]
+
+    assert db.query(Appointment).count() == 2
+
+    # the batch is visible to later single bookings
+    response = client.post(
+        f"/api/shared/appointments?business_id={test_service.owner_id}",
+        json=item("11:30")
+    )
+    assert response.status_code == 400
+
+def test_create_appointment_series(client, test_service, test_availability, db):
+    """Test a weekly series books free weeks and reports the taken one"""
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    taken = monday + timedelta(weeks=2)
+    client.post(
+        f"/api/shared/appointments?business_id={test_service.owner_id}",
+        json={
+            "date": taken.strftime("%Y-%m-%dT10:00:00"),
+            "start_time": "10:30",
+            "title": test_service.name,
+            "customer_name": "Other Customer",
+            "customer_phone": "0500000000"
+        }
+    )
+
+    response = client.post(
+        f"/api/shared/appointments/series?business_id={test_service.owner_id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT10:00:00"),
+            "start_time": "10:00",
+            "title": test_service.name,
+            "customer_name": "Regular Customer",
+            "customer_phone": "1234567890",
+            "frequency": "weekly",
+            "count": 4
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 1
+    assert data["series_id"] is not None
+    occurrences = data["occurrences"]
+    assert [o["date"] for o in occurrences] == [
+        (monday + timedelta(weeks=i)).strftime("%Y-%m-%d") for i in range(4)
+    ]
+    assert [o["success"] for o in occurrences] == [True, True, False, True]
+    assert "existing appointment" in occurrences[2]["error"]
+    assert db.query(Appointment).filter(Appointment.series_id == data["series_id"]).count() == 3
+
+def test_create_appointment_series_every_n_days_until(client, test_service, test_availability):
+    """Test every-N-days series with an end date; off days are reported"""
+    monday = datetime.now() + timedelta(days=(7 - datetime.now().weekday()))
+    response = client.post(
+        f"/api/shared/appointments/series?business_id={test_service.owner_id}",
+        json={
+            "date": monday.strftime("%Y-%m-%dT09:00:00"),
+            "start_time": "09:00",
+            "title": test_service.name,
+            "customer_name": "Regular Customer",
+            "customer_phone": "1234567890",
+            "frequency": "every_n_days",
+            "interval_days": 3,
+            "until": (monday + timedelta(days=21)).strftime("%Y-%m-%dT00:00:00")
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["occurrences"]) == 8
+    # only every 7th occurrence (21 days) lands on a Monday again
+    assert [o["success"] for o in data["occurrences"]] == [True] + [False] * 6 + [True]
+    assert "not available" in data["occurrences"][1]["error"]
+
+def test_create_appointment_series_validation(client, test_service, test_availability):
+    """Test series requests need exactly one of until/count and a bounded length"""
+    base = {
+        "date": "2030-01-07T10:00:00",
+        "start_time": "10:00",
+        "title": test_service.name,
+        "customer_name": "Regular Customer",
+        "customer_phone": "1234567890",
+        "frequency": "weekly"
+    }
+    url = f"/api/shared/appointments/series?business_id={test_service.owner_id}"
+    assert client.post(url, json=base).status_code == 422
+    assert client.post(url, json={**base, "count": 2, "until": "2030-02-01T00:00:00"}).status_code == 422
+    assert client.post(url, json={**base, "frequency": "every_n_days", "count": 2}).status_code == 422
+    response = client.post(url, json={**base, "until": "2040-01-01T00:00:00"})
+    assert response.status_code == 400
+    assert "limited" in response.json()["detail"]
+
+
+def test_day_runs():
+    monday = date(2030, 1, 7)
+    days = [monday, monday + timedelta(days=1), monday + timedelta(days=2), monday + timedelta(days=14)]
+    assert day_runs(days) == [(monday, monday + timedelta(days=2)), (days[3], days[3])]
+
+def test_appointments_on_scattered_days_skip_the_gap(db, business_owner, monkeypatch):
+    import app.slots as slots
+    monkeypatch.setattr(slots, "RANGES_PER_QUERY", 2)
+    first = date(2030, 1, 7)
+    for weeks in range(10):
+        db.add(Appointment(business_id=business_owner.id, date=datetime.combine(first + timedelta(weeks=weeks), time(10)),
+                           start_time=time(10), duration=30, title="Test Service", customer_name="Test Customer",
+                           customer_phone="1234567890", type="Test Service", cost=100))
+    db.commit()
+
+    days = [first, first + timedelta(weeks=4), first + timedelta(weeks=9)]
+    found = owner_appointments_on_days(db, business_owner.id, days)
+    assert sorted(apt_date.date() for apt_date, _, _ in found) == days
@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+import app.dependencies as dependencies
+from app.main import app
+from app.metrics import render_metrics
+from app.security import create_access_token
+from app.token_cache import TokenCache
+
+def claims(sub, ttl=60):
+    return {"sub": sub, "role": "customer", "exp": int(time.time()) + ttl}
+
+def test_hit_returns_a_copy_of_the_claims():
+    cache = TokenCache(size=10)
+    assert cache.get("token") is None
+    cache.put("token", claims("johndoe"))
+    cached = cache.get("token")
+    cached["role"] = "business_owner"
+    assert cache.get("token")["role"] == "customer"
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_expired_tokens_are_not_served():
+    cache = TokenCache(size=10)
+    cache.put("token", claims("johndoe", ttl=-1))
+    assert cache.get("token") is None
+    assert len(cache._claims) == 0
+
+def test_tokens_without_expiry_are_not_cached():
+    cache = TokenCache(size=10)
+    cache.put("token", {"sub": "johndoe", "role": "customer"})
+    assert cache.get("token") is None
+
+def test_least_recently_used_token_is_evicted():
+    cache = TokenCache(size=2)
+    for token in ("a", "b"):
+        cache.put(token, claims(token))
+    cache.get("a")
+    cache.put("c", claims("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evictions == 1
+
+def test_token_verified_once_per_worker(monkeypatch):
+    decoded = []
+    decode = dependencies.jwt.decode
+    monkeypatch.setattr(dependencies.jwt, "decode", lambda *args, **kwargs: decoded.append(1) or decode(*args, **kwargs))
+    token = create_access_token(data={"sub": "johndoe", "role": "customer"})
+
+    for _ in range(3):
+        assert dependencies.get_current_user(token)["sub"] == "johndoe"
+    assert len(decoded) == 1
+
+def test_expired_token_still_rejected():
+    token = create_access_token(data={"sub": "johndoe", "role": "customer"}, expires_delta=timedelta(seconds=-1))
+    client = TestClient(app)
+    response = client.get("/api/shared/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_cache_counters_exported():
+    token = create_access_token(data={"sub": "johndoe", "role": "customer"})
+    for _ in range(2):
+        dependencies.get_current_user(token)
+    metrics = render_metrics()
+    assert "jwt_cache_hits_total 1" in metrics
+    assert "jwt_cache_misses_total 1" in metrics
+    assert "jwt_cache_entries 1" in metrics
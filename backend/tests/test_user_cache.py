@@ -0,0 +1,124 @@
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_async_db
+from app.models import User
+from app.security import SECRET_KEY, ALGORITHM, create_access_token
+from app.user_cache import UserCache, user_cache
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+def add_user(username, phone, role="business_owner"):
+    db = TestingSessionLocal()
+    user = User(
+        first_name=username.capitalize(),
+        last_name="Test",
+        username=username,
+        phone=phone,
+        password_hash="hashed_password",
+        role=role,
+        business_name="Jane's Salon" if role == "business_owner" else None
+    )
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+def auth(username, user_id, role="business_owner"):
+    token = create_access_token(data={"sub": username, "uid": user_id, "role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+def test_login_token_carries_user_id(client):
+    client.post("/auth/register", json={
+        "first_name": "John",
+        "last_name": "Doe",
+        "username": "johndoe",
+        "phone": "1234567890",
+        "password": "testpass123",
+        "role": "customer"
+    })
+    token = client.post("/auth/login", data={"username": "johndoe", "password": "testpass123"}).json()["access_token"]
+    assert jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["uid"] == 1
+
+def test_repeat_requests_skip_user_lookup(client, max_statements):
+    headers = auth("janesmith", add_user("janesmith", "0987654321"))
+
+    assert max_statements(client.get("/api/services/my-services", headers=headers), 2) == 2
+    assert max_statements(client.get("/api/services/my-services", headers=headers), 1) == 1
+
+    # the async resolver shares the cache
+    response = client.get("/api/shared/me", headers=headers)
+    assert max_statements(response, 0) == 0
+    assert response.json()["username"] == "janesmith"
+
+def test_user_update_invalidates_cache(client):
+    user_id = add_user("janesmith", "0987654321")
+    headers = auth("janesmith", user_id)
+    assert client.get("/api/shared/me", headers=headers).json()["business_name"] == "Jane's Salon"
+
+    db = TestingSessionLocal()
+    db.get(User, user_id).business_name = "Jane's Studio"
+    db.commit()
+    db.close()
+
+    assert client.get("/api/shared/me", headers=headers).json()["business_name"] == "Jane's Studio"
+
+def test_token_id_must_match_username(client):
+    add_user("janesmith", "0987654321")
+    other_id = add_user("johndoe", "1234567890", role="customer")
+    response = client.get("/api/shared/me", headers=auth("janesmith", other_id))
+    assert response.status_code == 404
+
+def test_token_without_id_still_resolves(client):
+    add_user("janesmith", "0987654321")
+    token = create_access_token(data={"sub": "janesmith", "role": "business_owner"})
+    response = client.get("/api/shared/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["id"] == 1
+
+def test_least_recently_used_user_is_evicted(client):
+    cache = UserCache(size=2)
+    ids = [add_user(f"user{i}", f"05000000{i}") for i in range(3)]
+    db = TestingSessionLocal()
+    try:
+        cache.get(db, ids[0])
+        cache.get(db, ids[1])
+        cache.get(db, ids[0])  # ids[1] is now the least recently used
+        cache.get(db, ids[2])
+    finally:
+        db.close()
+    assert list(cache._users) == [ids[0], ids[2]]
+    assert user_cache._users == {}
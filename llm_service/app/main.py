@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Dict
@@ -6,6 +7,7 @@ import os
 import json
 import requests
 from dotenv import load_dotenv
+from app.metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE
 
 # Load environment variables
 load_dotenv()
@@ -23,6 +25,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 def extract_keywords(query: str) -> List[str]:
     """Extract meaningful keywords from the search query"""
@@ -94,4 +97,10 @@ async def analyze_query(query: SearchQuery):
 # Health check endpoint
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "model": "keyword-matching"}
\ No newline at end of file
+    return {"status": "healthy", "model": "keyword-matching"}
+
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
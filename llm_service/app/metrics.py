@@ -0,0 +1,152 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class RequestMetrics:
+    """
+    Request counters and latency histograms keyed by route template.
+
+    Recording a request is a dict lookup, a bisect and a few integer adds
+    under one lock; rendering the text format is left to scrape time.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.in_progress = 0
+            self._responses: Dict[Tuple[str, str, int], int] = {}
+            # (method, route) -> [per-bucket counts..., +Inf count, sum of seconds]
+            self._latency: Dict[Tuple[str, str], List[float]] = {}
+
+    def started(self):
+        with self._lock:
+            self.in_progress += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float):
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.in_progress -= 1
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+            histogram = self._latency.get((method, route))
+            if histogram is None:
+                histogram = self._latency[(method, route)] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+
+    def render(self) -> List[str]:
+        with self._lock:
+            in_progress = self.in_progress
+            responses = dict(self._responses)
+            latency = {key: list(values) for key, values in self._latency.items()}
+
+        lines = [
+            "# HELP http_requests_in_progress Requests currently being handled",
+            "# TYPE http_requests_in_progress gauge",
+            f"http_requests_in_progress {in_progress}",
+            "# HELP http_requests_total Requests handled, by route template and status",
+            "# TYPE http_requests_total counter",
+        ]
+        errors: Dict[Tuple[str, str], int] = {}
+        for (method, route, status), count in sorted(responses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+            if status >= 500:
+                errors[(method, route)] = errors.get((method, route), 0) + count
+
+        lines += [
+            "# HELP http_request_errors_total Requests that ended in a 5xx or an unhandled exception",
+            "# TYPE http_request_errors_total counter",
+        ]
+        for (method, route), count in sorted(errors.items()):
+            lines.append(f"http_request_errors_total{_labels(method=method, route=route)} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by route template",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram[:-1]):
+                cumulative += count
+                lines.append(
+                    f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}"
+                )
+            labels = _labels(method=method, route=route)
+            lines.append(f"http_request_duration_seconds_sum{labels} {histogram[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels} {cumulative}")
+        return lines
+
+
+request_metrics = RequestMetrics()
+
+
+# Metric families rendered on every scrape besides the request metrics
+collectors: List[Callable[[], List[str]]] = []
+
+
+def render_metrics() -> str:
+    lines = request_metrics.render()
+    for collect in collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route, e.g. /analyze-query"""
+    route = scope.get("route")
+    if route is None and "endpoint" in scope:
+        # older Starlette only records the endpoint of the matched route
+        route = next(
+            (r for r in scope["app"].routes if getattr(r, "endpoint", None) is scope["endpoint"]),
+            None
+        )
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Record every HTTP request in request_metrics"""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # unless a response starts
+        began = time.perf_counter()
+        self.metrics.started()
+
+        async def send_and_capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            self.metrics.finished(
+                scope["method"], route_template(scope), status, time.perf_counter() - began
+            )